@@ -1,15 +1,31 @@
+import time
+# The start of the import, reported by Timing.
+STARTED = time.perf_counter()
+import io
 import os
+import re
+import shlex
+import stat
 import sys
-from argparse import Action, ArgumentParser, REMAINDER, SUPPRESS
-from typing import Iterable
+from argparse import Action, ArgumentError, ArgumentParser, Namespace, REMAINDER, SUPPRESS
+from collections.abc import Callable, Iterable, Iterator
+
+# The modules that are imported where they are used, for the annotations.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import socket
 
 
 try:
+    # argcomplete is a noticeable share of the startup, it is imported
+    # only for the completion. The placeholders are used otherwise.
+    if '_ARGCOMPLETE' not in os.environ:
+        raise ImportError('argcomplete is not requested.')
     from argcomplete.completers import BaseCompleter as Completer
     from argcomplete.completers import SuppressCompleter as CompleterNone
     from argcomplete.completers import ChoicesCompleter as CompleterList
     from argcomplete.completers import FilesCompleter as CompleterPath
-    from argcomplete import autocomplete
+    from argcomplete import CompletionFinder
 except:
     class Completer:
         def __init__(self) -> 'None':
@@ -27,7 +43,7 @@ except:
 
     class CompleterList(Completer):
         def __init__(self, v: 'list[str]') -> 'None':
-            ...
+            self.choices = v
 
         def __call__(self, *args, **kwds) -> 'list[str]':
             ...
@@ -39,11 +55,60 @@ except:
         def __call__(self, *args, **kwds) -> 'list[str]':
             ...
 
-    def autocomplete(*args, **kwds) -> 'None':
-        ...
+    class CompletionFinder:
+        def __call__(self, *args, **kwds) -> 'None':
+            ...
+
+
+# Stateless, the default completers are shared by all Arg.
+COMPLETER_PATH = CompleterPath()
+COMPLETER_NONE = CompleterNone()
+# The Runner of a batch pool process, inherited by fork, see Runner.batch.
+BATCH = None
+# The number of suggestions for a typo. Up to twice as many choices are
+# listed in full instead, see hint().
+SUGGEST = 5
+# The number of names listed for an invalid value, the rest is counted.
+LISTED = 50
+# The directory of the stored suggestion indexes, set by main() with the
+# parser cache, see index().
+INDEXES = None
+# NumPy for Arg.array, looked up on the first conversion. False if it cannot
+# be imported, the import is not retried, see ndarray().
+NUMPY = None
+# The thread pools of Arg.workers by (pid, kind, workers), see pool().
+POOLS = {}
 
 
 class Arg:
+    __slots__ = (
+        '___name',
+        '___type',
+        '___count',
+        '___default',
+        '___completer',
+        '__name',
+        '__lopt',
+        '__sopt',
+        '__help',
+        '__helper',
+        '__type',
+        '__count',
+        '__default',
+        '__choices',
+        '__restrict',
+        '__suppress',
+        '__required',
+        '__append',
+        '__completer',
+        '__stream',
+        '__array',
+        '__workers',
+        '__convert',
+        '__index',
+        '__revision',
+    )
+
     @property
     def name(self) -> 'str':
         return self.__name
@@ -53,6 +118,7 @@ class Arg:
         # Validate.
         raise_t(v, (str, type(None)), 'Arg.name')
         # Set.
+        self.__revision += 1
         self.___name = v or ''
         self.__name = self.___name or self.lopt.upper() or self.sopt.upper()
 
@@ -65,6 +131,7 @@ class Arg:
         # Validate.
         raise_t(v, (str, type(None)), 'Arg.lopt')
         # Set.
+        self.__revision += 1
         self.__lopt = v or ''
         self.name = self.___name
         self.suppress = self.__suppress
@@ -78,12 +145,9 @@ class Arg:
     @sopt.setter
     def sopt(self, v: 'str | None') -> 'None':
         # Validate.
-        raise_t(v, (str, type(None)), 'Arg.sopt')
-        raise_v(f'"{v}"',
-                len(v or '') > 1,
-                'Arg.sopt',
-                'Must not exceed one character.')
+        self.__check_sopt(v)
         # Set.
+        self.__revision += 1
         self.__sopt = v or ''
         self.name = self.___name
         self.suppress = self.__suppress
@@ -99,10 +163,14 @@ class Arg:
         # Validate.
         raise_t(v, (str, type(None)), 'Arg.help')
         # Set.
+        self.__revision += 1
         self.__help = v or ''
 
     @property
     def helper(self) -> 'ArgHelper':
+        # The default is allocated on the first access, most Arg never need it.
+        if self.__helper is None:
+            self.__helper = ArgHelper()
         return self.__helper
 
     @helper.setter
@@ -110,7 +178,8 @@ class Arg:
         # Validate.
         raise_t(v, (ArgHelper, type(None)), 'Arg.helper')
         # Set.
-        self.__helper = v or ArgHelper()
+        self.__revision += 1
+        self.__helper = v
 
     @property
     def type(self) -> 'type':
@@ -130,17 +199,9 @@ class Arg:
                 M = f'{M} {type(self.default).__name__}.'
                 raise_v(v.__name__, not isinstance(self.default, v), V, M)
         # Set.
+        self.__revision += 1
         self.___type = v
-        self.__type = self.___type
-        if self.flag:
-            self.__type = bool
-        elif self.__type is None:
-            if isinstance(self.default, list) and self.default:
-                self.__type = type(self.default[0])
-            elif not isinstance(self.default, list) and self.default is not None:
-                self.__type = type(self.default)
-            else:
-                self.__type = str
+        self.__resolve_type()
         if self.___completer is None:
             self.completer = None
 
@@ -151,31 +212,9 @@ class Arg:
     @count.setter
     def count(self, v: 'int | str | None') -> 'None':
         # Validate.
-        V = 'Arg.count'
-        raise_t(v, (int, str, type(None)), V)
-        if self.optional:
-            if isinstance(v, int):
-                M = f'Must be non-negative for optional.'
-                raise_v(v, v < 0, V, M)
-            if isinstance(v, str):
-                M = f'Must be "?", "*" or "+" for optional.'
-                raise_v(f'"{v}"', v not in ['?', '*', '+'], V, M)
-        if self.positional:
-            if isinstance(v, int):
-                M = f'Must be positive for positional.'
-                raise_v(v, v <= 0, V, M)
-            if isinstance(v, str):
-                M = f'Must be "?", "*", "+" or "~" for positional.'
-                raise_v(f'"{v}"', v not in ['?', '*', '+', '~'], V, M)
-        if isinstance(self.default, list):
-            l = len(self.default)
-            if v == '+':
-                M = f'Must allow zero values, self.default is empty.'
-                raise_v(f'"{v}"', l == 0, V, M)
-            if isinstance(v, int):
-                M = f'Must match the number of values in self.default: {l}.'
-                raise_v(v, v != l, V, M)
+        self.__check_count(v)
         # Set.
+        self.__revision += 1
         self.___count = v
         v = self.__count
         self.__count = self.___count
@@ -192,37 +231,11 @@ class Arg:
     @default.setter
     def default(self, v: 'object | list | None') -> 'None':
         # Validate.
-        V = 'Arg.default'
-        if isinstance(v, Iterable) and not isinstance(v, str):
-            v = [x for x in v]
-        if self.___type is not None:
-            if isinstance(v, list):
-                for i in range(len(v)):
-                    raise_t(v[i], self.type, f'{V}[{i}]')
-            else:
-                raise_t(v, (self.type, type(None)), V)
-        if self.___count is not None:
-            if isinstance(v, list):
-                if self.single:
-                    raise TypeError(
-                        f'{V}: Invalid type: list. Must be: object, None.')
-                if isinstance(self.count, int):
-                    M = f'Must match self.count: {self.count}.'
-                    O = Exception(f'len() is {len(v)}')
-                    raise_v(O, len(v) != self.count, V, M)
-                elif self.count == '+':
-                    M = 'Must have at least one item, self.count is "+".'
-                    raise_v(v, not v, V, M)
-            elif self.multiple:
-                raise_t(v, (list, type(None)), V)
+        v = self.__check_default(v)
         # Set.
+        self.__revision += 1
         self.___default = v
-        self.__default = self.___default
-        if self.__default is None:
-            if self.flag:
-                self.__default = False
-            elif self.___count in ['*', '~']:
-                self.__default = []
+        self.__resolve_default()
         if self.___count is None:
             self.count = None
         if self.___type is None:
@@ -237,11 +250,8 @@ class Arg:
         # Validate.
         raise_t(v, (Iterable, type(None)), 'Arg.choices')
         # Set.
-        self.__choices = {}
-        if isinstance(v, dict):
-            self.__choices = {str(x): str(y) for x, y in v.items()}
-        elif v:
-            self.__choices = {str(x): '' for x in v}
+        self.__revision += 1
+        self.__resolve_choices(v)
         if self.___completer is None:
             self.completer = None
 
@@ -254,6 +264,7 @@ class Arg:
         # Validate.
         raise_t(v, (bool, type(None)), 'Arg.restrict')
         # Set.
+        self.__revision += 1
         self.__restrict = True if v is None else v
 
     @property
@@ -265,6 +276,7 @@ class Arg:
         # Validate.
         raise_t(v, (bool, type(None)), 'Arg.suppress')
         # Set.
+        self.__revision += 1
         self.__suppress = False if self.positional else bool(v)
 
     @property
@@ -276,6 +288,7 @@ class Arg:
         # Validate.
         raise_t(v, (bool, type(None)), 'Arg.required')
         # Set.
+        self.__revision += 1
         self.__required = self.positional or bool(v)
 
     @property
@@ -287,6 +300,7 @@ class Arg:
         # Validate.
         raise_t(v, (bool, type(None)), 'Arg.append')
         # Set.
+        self.__revision += 1
         self.__append = False if self.positional else bool(v)
 
     @property
@@ -296,17 +310,51 @@ class Arg:
     @completer.setter
     def completer(self, v: 'Completer | None') -> 'None':
         # Validate.
-        raise_t(v, (Completer, type(None)), 'Arg.completer')
+        self.__check_completer(v)
         # Set.
+        self.__revision += 1
         self.___completer = v
-        self.__completer = self.___completer
-        if self.__completer is None:
-            if self.choices:
-                self.__completer = CompleterList(self.choices)
-            elif issubclass(self.type, str):
-                self.__completer = CompleterPath()
-            else:
-                self.__completer = CompleterNone()
+        self.__resolve_completer()
+
+    @property
+    def stream(self) -> 'bool':
+        return self.__stream
+
+    @stream.setter
+    def stream(self, v: 'bool | None') -> 'None':
+        # Validate.
+        raise_t(v, (bool, type(None)), 'Arg.stream')
+        # Set.
+        self.__revision += 1
+        self.__stream = bool(v)
+
+    @property
+    def array(self) -> 'bool':
+        return self.__array
+
+    @array.setter
+    def array(self, v: 'bool | None') -> 'None':
+        # Validate.
+        raise_t(v, (bool, type(None)), 'Arg.array')
+        # Set.
+        self.__revision += 1
+        self.__array = bool(v)
+
+    @property
+    def workers(self) -> 'int':
+        return self.__workers
+
+    @workers.setter
+    def workers(self, v: 'int | None') -> 'None':
+        # Validate.
+        self.__check_workers(v)
+        # Set.
+        self.__revision += 1
+        self.__workers = v or 0
+
+    @property
+    def revision(self) -> 'int':
+        return self.__revision
 
     @property
     def optional(self) -> 'bool':
@@ -344,6 +392,9 @@ class Arg:
         required: 'bool | None' = None,
         append: 'bool | None' = None,
         completer: 'Completer | None' = None,
+        stream: 'bool | None' = None,
+        array: 'bool | None' = None,
+        workers: 'int | None' = None,
     ) -> 'None':
         # Actual value.
         self.___name: 'str | None' = None
@@ -360,12 +411,15 @@ class Arg:
         # No required.
         # No append.
         self.___completer: 'Completer | None' = None
+        # No stream.
+        # No array.
+        # No workers.
         # Cached value.
         self.__name: 'str' = ''
         self.__lopt: 'str' = ''
         self.__sopt: 'str' = ''
         self.__help: 'str' = ''
-        self.__helper: 'ArgHelper' = ArgHelper()
+        self.__helper: 'ArgHelper | None' = None
         self.__type: 'type' = str
         self.__count: 'int | str' = 1
         self.__default: 'object | list | None' = None
@@ -374,88 +428,444 @@ class Arg:
         self.__suppress: 'bool' = False
         self.__required: 'bool' = True
         self.__append: 'bool' = False
-        self.__completer: 'Completer' = CompleterPath()
-        # Set the fields.
-        self.name = name
-        self.lopt = lopt
-        self.sopt = sopt
-        self.help = help
-        self.helper = helper
-        self.type = type
-        self.count = count
-        self.default = default
-        self.choices = choices
-        self.restrict = restrict
-        self.suppress = suppress
-        self.required = required
-        self.append = append
-        self.completer = completer
+        self.__completer: 'Completer' = COMPLETER_PATH
+        self.__stream: 'bool' = False
+        self.__array: 'bool' = False
+        self.__workers: 'int' = 0
+        self.__convert: 'tuple[int, Callable]' = (-1, None)
+        self.__index: 'tuple[int, Index]' = (-1, None)
+        self.__revision: 'int' = 0
+        # Set the fields in a single pass.
+        self.__init___fields({
+            'name': name,
+            'lopt': lopt,
+            'sopt': sopt,
+            'help': help,
+            'helper': helper,
+            'type': type,
+            'count': count,
+            'default': default,
+            'choices': choices,
+            'restrict': restrict,
+            'suppress': suppress,
+            'required': required,
+            'append': append,
+            'completer': completer,
+            'stream': stream,
+            'array': array,
+            'workers': workers,
+        })
+
+    def __init___fields(self, v: 'dict[str, object]') -> 'None':
+        # The setters validate and resolve the dependent fields on each call.
+        # Here, each field is validated once, in the same order and with the
+        # same messages, then the derived values are resolved once.
+        # Validate.
+        raise_t(v['name'], (str, type(None)), 'Arg.name')
+        raise_t(v['lopt'], (str, type(None)), 'Arg.lopt')
+        self.__check_sopt(v['sopt'])
+        raise_t(v['help'], (str, type(None)), 'Arg.help')
+        raise_t(v['helper'], (ArgHelper, type(None)), 'Arg.helper')
+        raise_t(v['type'], (type, type(None)), 'Arg.type')
+        self.__lopt = v['lopt'] or ''
+        self.__sopt = v['sopt'] or ''
+        self.__check_count(v['count'])
+        self.___type = v['type']
+        self.___count = v['count']
+        self.__count = 1 if v['count'] is None else v['count']
+        self.__type = bool if self.flag else (v['type'] or str)
+        self.___default = self.__check_default(v['default'])
+        raise_t(v['choices'], (Iterable, type(None)), 'Arg.choices')
+        raise_t(v['restrict'], (bool, type(None)), 'Arg.restrict')
+        raise_t(v['suppress'], (bool, type(None)), 'Arg.suppress')
+        raise_t(v['required'], (bool, type(None)), 'Arg.required')
+        raise_t(v['append'], (bool, type(None)), 'Arg.append')
+        self.__check_completer(v['completer'])
+        raise_t(v['stream'], (bool, type(None)), 'Arg.stream')
+        raise_t(v['array'], (bool, type(None)), 'Arg.array')
+        self.__check_workers(v['workers'])
+        # Set.
+        self.__revision += 1
+        self.___name = v['name'] or ''
+        self.__name = self.___name or self.__lopt.upper() or self.__sopt.upper()
+        self.__help = v['help'] or ''
+        self.__helper = v['helper']
+        if self.___count is None:
+            self.__count = '*' if isinstance(self.___default, list) else 1
+        self.__resolve_default()
+        self.__resolve_type()
+        self.__resolve_choices(v['choices'])
+        self.__restrict = True if v['restrict'] is None else v['restrict']
+        self.__suppress = False if self.positional else bool(v['suppress'])
+        self.__required = self.positional or bool(v['required'])
+        self.__append = False if self.positional else bool(v['append'])
+        self.___completer = v['completer']
+        self.__resolve_completer()
+        self.__stream = bool(v['stream'])
+        self.__array = bool(v['array'])
+        self.__workers = v['workers'] or 0
+
+    def __check_sopt(self, v: 'str | None') -> 'None':
+        raise_t(v, (str, type(None)), 'Arg.sopt')
+        raise_v(f'"{v}"',
+                len(v or '') > 1,
+                'Arg.sopt',
+                'Must not exceed one character.')
 
-    def __call__(
-        self,
-        v: 'bool | int | str | list | list[list] | None',
-    ) -> 'bool | int | object | list | list[list] | None':
-        if self.flag:
-            if not self.append:
-                return self.__call___bool(v)
-            else:
-                return self.__call___int(v)
-        if self.single:
-            if not self.append:
-                return self.__call___str(v)
-            else:
-                return self.__call___list(v)
-        if self.multiple:
-            if not self.append:
-                return self.__call___list_str(v)
+    def __check_count(self, v: 'int | str | None') -> 'None':
+        V = 'Arg.count'
+        raise_t(v, (int, str, type(None)), V)
+        if self.optional:
+            if isinstance(v, int):
+                M = f'Must be non-negative for optional.'
+                raise_v(v, v < 0, V, M)
+            if isinstance(v, str):
+                M = f'Must be "?", "*" or "+" for optional.'
+                raise_v(f'"{v}"', v not in ['?', '*', '+'], V, M)
+        if self.positional:
+            if isinstance(v, int):
+                M = f'Must be positive for positional.'
+                raise_v(v, v <= 0, V, M)
+            if isinstance(v, str):
+                M = f'Must be "?", "*", "+" or "~" for positional.'
+                raise_v(f'"{v}"', v not in ['?', '*', '+', '~'], V, M)
+        if isinstance(self.default, list):
+            l = len(self.default)
+            if v == '+':
+                M = f'Must allow zero values, self.default is empty.'
+                raise_v(f'"{v}"', l == 0, V, M)
+            if isinstance(v, int):
+                M = f'Must match the number of values in self.default: {l}.'
+                raise_v(v, v != l, V, M)
+
+    def __check_default(self, v: 'object | list | None') -> 'object | list | None':
+        V = 'Arg.default'
+        if isinstance(v, Iterable) and not isinstance(v, str):
+            v = [x for x in v]
+        if self.___type is not None:
+            if isinstance(v, list):
+                for i in range(len(v)):
+                    raise_t(v[i], self.type, f'{V}[{i}]')
             else:
-                return self.__call___list_list(v)
+                raise_t(v, (self.type, type(None)), V)
+        if self.___count is not None:
+            if isinstance(v, list):
+                if self.single:
+                    raise TypeError(
+                        f'{V}: Invalid type: list. Must be: object, None.')
+                if isinstance(self.count, int):
+                    M = f'Must match self.count: {self.count}.'
+                    O = Exception(f'len() is {len(v)}')
+                    raise_v(O, len(v) != self.count, V, M)
+                elif self.count == '+':
+                    M = 'Must have at least one item, self.count is "+".'
+                    raise_v(v, not v, V, M)
+            elif self.multiple:
+                raise_t(v, (list, type(None)), V)
+        return v
 
-    def __call___bool(self, v: 'bool') -> 'bool':
-        return not self.default if v else self.default
+    def __check_workers(self, v: 'int | None') -> 'None':
+        raise_t(v, (int, type(None)), 'Arg.workers')
+        raise_v(v, (v or 0) < 0, 'Arg.workers', 'Must be non-negative.')
 
-    def __call___int(self, v: 'int') -> 'int':
-        return v
+    def __check_completer(self, v: 'Completer | None') -> 'None':
+        # argcomplete may be imported directly by the caller.
+        base = sys.modules.get('argcomplete.completers')
+        if not isinstance(v, getattr(base, 'BaseCompleter', Completer)):
+            raise_t(v, (Completer, type(None)), 'Arg.completer')
 
-    def __call___str(self, v: 'str | None') -> 'object | None':
-        if self.restrict and self.choices:
-            if v is not None and v not in self.choices:
-                raise CallError(
-                    f'Invalid value of argument {self.__strname()}: {v}. '
-                    f'Must be one of:{self.__strchoices()}',
-                    1)
-        return self.default if v is None else self.type(v)
+    def __resolve_type(self) -> 'None':
+        self.__type = self.___type
+        if self.flag:
+            self.__type = bool
+        elif self.__type is None:
+            if isinstance(self.default, list) and self.default:
+                self.__type = type(self.default[0])
+            elif not isinstance(self.default, list) and self.default is not None:
+                self.__type = type(self.default)
+            else:
+                self.__type = str
 
-    def __call___list(self, v: 'list[str | None]') -> 'list[object | None]':
-        if self.restrict and self.choices:
-            for i in range(len(v)):
-                if v[i] is not None and v[i] not in self.choices:
-                    raise CallError(
-                        f'Invalid value of argument {self.__strname()}[{i}]: {v[i]}. '
-                        f'Must be one of:{self.__strchoices()}',
-                        1)
-        return [self.default if x is None else self.type(x) for x in v]
+    def __resolve_default(self) -> 'None':
+        self.__default = self.___default
+        if self.__default is None:
+            if self.flag:
+                self.__default = False
+            elif self.___count in ['*', '~']:
+                self.__default = []
 
-    def __call___list_str(self, v: 'list[str] | None') -> 'list[object] | None':
-        if self.restrict and self.choices and v is not None:
-            for i in range(len(v)):
-                if v[i] not in self.choices:
+    def __resolve_choices(self, v: 'list | dict | None') -> 'None':
+        self.__choices = {}
+        if isinstance(v, dict):
+            self.__choices = {str(x): str(y) for x, y in v.items()}
+        elif v:
+            self.__choices = {str(x): '' for x in v}
+
+    def __resolve_completer(self) -> 'None':
+        self.__completer = self.___completer
+        if self.__completer is None:
+            if self.choices:
+                self.__completer = CompleterList(self.choices)
+            elif issubclass(self.type, str):
+                self.__completer = COMPLETER_PATH
+            else:
+                self.__completer = COMPLETER_NONE
+
+    def __call__(
+        self,
+        v: 'bool | int | str | list | list[list] | None',
+    ) -> 'bool | int | object | list | list[list] | None':
+        # The converter is compiled once per revision of this Arg, only its
+        # own setters bump it.
+        if self.__convert[0] != self.__revision:
+            self.__convert = (self.__revision, self.__compile())
+        return self.__convert[1](v)
+
+    def __compile(self) -> 'Callable':
+        # The properties are resolved here, the converter only captures them.
+        T = self.type
+        D = self.default
+        C = self.choices if self.restrict else {}
+        W = self.workers
+        check = self.__check
+        values = self.__convert_values
+        if self.flag:
+            if self.append:
+                return lambda v: v
+            return lambda v: (not D) if v else D
+        if self.single:
+            if self.append:
+                def convert(v: 'list[str | None]') -> 'list[object | None]':
+                    if C:
+                        check(v, '')
+                    if W:
+                        return values(lambda x: D if x is None else T(x), v, W, '')
+                    return [D if x is None else T(x) for x in v]
+                return convert
+
+            def convert(v: 'str | None') -> 'object | None':
+                if v is None:
+                    return D
+                if C and v not in C:
                     raise CallError(
-                        f'Invalid value of argument {self.__strname()}[{i}]: {v[i]}. '
-                        f'Must be one of:{self.__strchoices()}',
+                        f'Invalid value of argument {self.__strname()}: {v}.'
+                        f'{self.__strhint([v])}',
                         1)
-        return self.default if v is None else [self.type(x) for x in v]
+                return T(v)
+            return convert
+        array = self.array and T in [int, float]
+        # The array reads the argument files itself.
+        stream = self.stream and isinstance(self.count, str) and not array
+        # The default is delivered as the same type as the values, a new
+        # Iterator or array per call.
+        if stream:
+            def default() -> 'Iterator[object] | None':
+                return None if D is None else iter(D)
+        elif array:
+            def default() -> 'object':
+                import array
+                return None if D is None else ndarray(array.array('q' if T is int else 'd', D))
+        else:
+            def default() -> 'list[object] | None':
+                return D
+        if self.append:
+            def convert(v: 'list[list[str] | None]') -> 'list[list[object] | None]':
+                if array:
+                    return [(default() if not v[i] else self.__call___array(v[i], f'[{i}]'))
+                            for i in range(len(v))]
+                # The stream checks the values as they are read.
+                if stream:
+                    return [(default() if not v[i] else self.__call___stream(v[i], f'[{i}]'))
+                            for i in range(len(v))]
+                if C:
+                    for i in range(len(v)):
+                        check(v[i] or [], f'[{i}]')
+                return [(D if not v[i] else values(T, v[i], W, f'[{i}]'))
+                        for i in range(len(v))]
+            return convert
+
+        def convert(v: 'list[str] | None') -> 'list[object] | None':
+            if v is None:
+                return default()
+            if array:
+                return self.__call___array(v, '')
+            if stream:
+                return self.__call___stream(v, '')
+            if C:
+                check(v, '')
+            return values(T, v, W, '')
+        return convert
+
+    def __check(self, v: 'list[str]', index: 'str') -> 'None':
+        # One set difference for all the values. Only if it is not empty,
+        # the invalid values are looked up to report all of them. None is
+        # a missing value of an append argument.
+        if not set(v).difference(self.choices).difference([None]):
+            return
+        bad = [i for i in range(len(v))
+               if v[i] is not None and v[i] not in self.choices]
+        if len(bad) == 1:
+            i = bad[0]
+            raise CallError(
+                f'Invalid value of argument {self.__strname()}{index}[{i}]: {v[i]}.'
+                f'{self.__strhint([v[i]])}',
+                1)
+        values = ', '.join(f'{index}[{i}] {v[i]}' for i in bad)
+        raise CallError(
+            f'Invalid values of argument {self.__strname()}: {values}.'
+            f'{self.__strhint([v[i] for i in bad])}',
+            1)
+
+    def __convert_values(
+        self,
+        T: 'Callable',
+        v: 'list[str | None]',
+        workers: 'int',
+        index: 'str',
+    ) -> 'list[object]':
+        # On the workers, the errors of the type are reported by index, like
+        # for the array. Otherwise they are raised as is.
+        def fail(i: 'int', e: 'Exception') -> 'None':
+            raise CallError(
+                f'Invalid value of argument {self.__strname()}{index}[{i}]: {v[i]}. '
+                f'Must be: {self.type.__name__}.',
+                1) from e
+        return convert_values(T, v, workers, fail)
+
+    def __call___stream(self, v: 'list[str]', index: 'str') -> 'Iterator[object]':
+        # The files are opened now, so that the errors are reported with the
+        # usage. The values are read, checked and converted on iteration. The
+        # files are closed when the iterator is exhausted, closed or collected,
+        # also if the iteration never started.
+        import weakref
+        files = []
+        result = self.__stream_values(self.__sources(v, files), files, index)
+        for f in files:
+            weakref.finalize(result, f.close)
+        return result
 
-    def __call___list_list(self, v: 'list[list[str] | None]') -> 'list[list[object] | None]':
+    def __call___array(self, v: 'list[str]', index: 'str') -> 'object':
+        # The values are converted in one pass by array, the slow path only
+        # looks for the index of the first invalid value. The argument files
+        # are read whole.
+        import array
+        if self.stream and isinstance(self.count, str):
+            files = []
+            try:
+                v = [x for source in self.__sources(v, files) for x in source]
+            finally:
+                for f in files:
+                    f.close()
         if self.restrict and self.choices:
+            self.__check(v, index)
+        code = 'q' if self.type is int else 'd'
+        try:
+            # From a list, the array is allocated once.
+            result = array.array(code, list(map(self.type, v)))
+        except (ValueError, OverflowError):
+            result = array.array(code)
             for i in range(len(v)):
-                for j in range(len(v[i] if v[i] else [])):
-                    if v[i][j] not in self.choices:
+                try:
+                    result.append(self.type(v[i]))
+                except ValueError:
+                    M = f'Must be: {self.type.__name__}.'
+                except OverflowError:
+                    M = 'Must fit in 64 bits.'
+                else:
+                    continue
+                raise CallError(
+                    f'Invalid value of argument {self.__strname()}{index}[{i}]: {v[i]}. {M}',
+                    1)
+        return ndarray(result)
+
+    def __sources(
+        self,
+        v: 'list[str]',
+        files: 'list[io.BufferedReader]',
+    ) -> 'list[Iterable[str]]':
+        # The opened files are added to files, they are closed on an error.
+        sources = []
+        try:
+            for x in v:
+                if x == '-':
+                    f = open(sys.stdin.fileno(), 'rb', closefd=False)
+                elif x.startswith('@') and len(x) > 1:
+                    try:
+                        f = open(x[1:], 'rb')
+                    except OSError as e:
+                        raise CallError(
+                            f'Invalid value of argument {self.__strname()}: {x}. '
+                            f'{e.strerror}.',
+                            1)
+                elif sources and isinstance(sources[-1], list):
+                    sources[-1].append(x)
+                    continue
+                else:
+                    sources.append([x])
+                    continue
+                files.append(f)
+                sources.append(self.__lines(f))
+        except BaseException:
+            for f in files:
+                f.close()
+            raise
+        return sources
+
+    def __stream_values(
+        self,
+        sources: 'list[Iterable[str]]',
+        files: 'list[io.BufferedReader]',
+        index: 'str',
+    ) -> 'Iterator[object]':
+        check = self.restrict and self.choices
+        i = 0
+        try:
+            for source in sources:
+                for x in source:
+                    if check and x not in self.choices:
                         raise CallError(
-                            f'Invalid value of argument {self.__strname()}[{i}][{j}]: {v[i][j]}. '
-                            f'Must be one of:{self.__strchoices()}',
+                            f'Invalid value of argument {self.__strname()}{index}[{i}]: {x}.'
+                            f'{self.__strhint([x])}',
                             1)
-        return [(self.default if not l else [self.type(x) for x in l]) for l in v]
+                    yield self.type(x)
+                    i += 1
+        finally:
+            # A started source unmaps its file on close.
+            for source in sources:
+                if not isinstance(source, list):
+                    source.close()
+            for f in files:
+                f.close()
+
+    def __lines(self, f: 'io.BufferedReader') -> 'Iterator[str]':
+        # A regular file is mapped and split in blocks, without reading it
+        # whole. A pipe or an empty file cannot be mapped, it is read as is.
+        # The empty lines are skipped, like in xargs.
+        import mmap
+        encoding = sys.getfilesystemencoding()
+        with f:
+            try:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                m = None
+            read = f.read1 if m is None else m.read
+            rest = b''
+            try:
+                while True:
+                    block = read(1 << 20)
+                    if not block:
+                        break
+                    block = rest + block
+                    i = block.rfind(b'\n') + 1
+                    rest = block[i:]
+                    for x in block[:i].decode(encoding, 'surrogateescape').split('\n'):
+                        if x:
+                            yield x
+                if rest:
+                    yield rest.decode(encoding, 'surrogateescape')
+            finally:
+                if m is not None:
+                    m.close()
 
     def __strname(self) -> 'str':
         if self.lopt:
@@ -465,10 +875,31 @@ class Arg:
         return self.name
 
     def __strchoices(self) -> 'str':
-        return '\n * ' + '\n * '.join(self.choices)
+        return listed(self.choices)
+
+    def __strhint(self, v: 'list[str]') -> 'str':
+        # The index of the choices is built on the first invalid value.
+        if len(self.choices) > 2 * SUGGEST:
+            if self.__index[0] != self.__revision:
+                self.__index = (self.__revision, index(self.choices))
+            text = hint(v, [self.__index[1].search(x) for x in v])
+            if text:
+                return text
+        return f' Must be one of:{self.__strchoices()}'
 
 
 class App:
+    __slots__ = (
+        '__name',
+        '__help',
+        '__prolog',
+        '__epilog',
+        '__helper',
+        '__args',
+        '__apps',
+        '__revision',
+    )
+
     @property
     def name(self) -> 'str':
         return self.__name
@@ -478,6 +909,7 @@ class App:
         # Validate.
         raise_t(v, (str, type(None)), 'App.name')
         # Set.
+        self.__revision += 1
         self.__name = v or ''
 
     @property
@@ -489,6 +921,7 @@ class App:
         # Validate.
         raise_t(v, (str, type(None)), 'App.help')
         # Set.
+        self.__revision += 1
         self.__help = v or ''
         self.prolog = self.__prolog
 
@@ -501,6 +934,7 @@ class App:
         # Validate.
         raise_t(v, (str, type(None)), 'App.prolog')
         # Set.
+        self.__revision += 1
         self.__prolog = v or self.help
 
     @property
@@ -512,10 +946,14 @@ class App:
         # Validate.
         raise_t(v, (str, type(None)), 'App.epilog')
         # Set.
+        self.__revision += 1
         self.__epilog = v or ''
 
     @property
     def helper(self) -> 'AppHelper':
+        # The default is allocated on the first access.
+        if self.__helper is None:
+            self.__helper = AppHelper()
         return self.__helper
 
     @helper.setter
@@ -523,7 +961,8 @@ class App:
         # Validate.
         raise_t(v, (AppHelper, type(None)), 'App.helper')
         # Set.
-        self.__helper = v or AppHelper()
+        self.__revision += 1
+        self.__helper = v
 
     @property
     def args(self) -> 'list[Arg]':
@@ -533,6 +972,10 @@ class App:
     def apps(self) -> 'list[App]':
         return self.__apps
 
+    @property
+    def revision(self) -> 'int':
+        return self.__revision
+
     def __init__(
         self,
         name: 'str | None' = None,
@@ -541,11 +984,12 @@ class App:
         epilog: 'str | None' = None,
         helper: 'AppHelper | None' = None,
     ) -> 'None':
+        self.__revision = 0
         self.__name = ''
         self.__help = ''
         self.__prolog = ''
         self.__epilog = ''
-        self.__helper = AppHelper()
+        self.__helper = None
         self.__args = []
         self.__apps = []
         self.name = name
@@ -563,6 +1007,13 @@ class App:
 
 
 class ArgHelper:
+    __slots__ = (
+        '__choices',
+        '__default',
+        '__memo',
+        '__revision',
+    )
+
     @property
     def choices(self) -> 'bool':
         return self.__choices
@@ -572,6 +1023,7 @@ class ArgHelper:
         # Validate.
         raise_t(v, (bool, type(None)), 'ArgHelper.choices')
         # Set.
+        self.__revision += 1
         self.__choices = True if v is None else v
 
     @property
@@ -583,74 +1035,99 @@ class ArgHelper:
         # Validate.
         raise_t(v, (bool, type(None)), 'ArgHelper.default')
         # Set.
+        self.__revision += 1
         self.__default = True if v is None else v
 
+    @property
+    def revision(self) -> 'int':
+        return self.__revision
+
     def text_help(self, arg: 'Arg') -> 'str':
-        result = arg.help
+        k = ('help', arg)
+        state = (self.__revision, arg.revision)
+        result = self.__memo.recall(k, state) if self.__memo else None
+        if result is not None:
+            return result
         # Do not append anything for flag.
         if arg.flag:
-            return result
+            return self.__store(k, state, arg.help)
+        lines = [arg.help] if arg.help else []
         # Append default.
         if self.default and arg.default is not None and arg.default != []:
-            if result:
-                result += '\n'
-            result += 'Default: '
             items = [arg.default] if arg.single else arg.default
-            result += ' '.join('""' if x == '' else str(x) for x in items)
+            lines.append('Default: ' + ' '.join(
+                '""' if x == '' else str(x) for x in items))
         # Append choices.
         if self.choices and arg.choices:
-            if result:
-                result += '\n'
             if arg.restrict:
-                result += 'Allowed values:'
+                lines.append('Allowed values:')
             else:
-                result += 'Possible values:'
+                lines.append('Possible values:')
             w = max(len(x) for x in arg.choices)
             p = ' ' * (w + 6)
             for x, y in arg.choices.items():
                 if y:
-                    result += f'\n * {x:{w}}'
-                    lines = y.split('\n')
-                    result += f' - {lines[0]}'
-                    for i in range(1, len(lines)):
-                        result += f'\n{p}{lines[i]}'
+                    text = y.split('\n')
+                    lines.append(f' * {x:{w}} - {text[0]}')
+                    lines.extend(p + z for z in text[1:])
                 else:
-                    result += f'\n * {x}'
-        return result
+                    lines.append(f' * {x}')
+        return self.__store(k, state, '\n'.join(lines))
 
     def text_usage(self, arg: 'Arg') -> 'str':
-        result = ''
-        if arg.sopt:
-            result += f'-{arg.sopt}'
+        k = ('usage', arg)
+        state = arg.revision
+        result = self.__memo.recall(k, state) if self.__memo else None
+        if result is not None:
+            return result
+        opts = [f'-{arg.sopt}'] if arg.sopt else []
         if arg.lopt:
-            if result:
-                result += '/'
-            result += f'--{arg.lopt}'
-        result += ' '
+            opts.append(f'--{arg.lopt}')
         if isinstance(arg.count, int):
-            result += ' '.join([arg.name] * arg.count)
+            name = ' '.join([arg.name] * arg.count)
         elif arg.count == '?':
-            result += f'[{arg.name}]'
+            name = f'[{arg.name}]'
         elif arg.count == '*':
-            result += f'[{arg.name}...]'
+            name = f'[{arg.name}...]'
         elif arg.count == '+':
-            result += f'{arg.name} [{arg.name}...]'
+            name = f'{arg.name} [{arg.name}...]'
         elif arg.count == '~':
-            result += f'[{arg.name}]...'
-        return result.strip(' ')
+            name = f'[{arg.name}]...'
+        else:
+            name = ''
+        result = f'{"/".join(opts)} {name}'.strip(' ')
+        return self.__store(k, state, result)
+
+    def __store(self, k: 'tuple', state: 'object', text: 'str') -> 'str':
+        if self.__memo is None:
+            self.__memo = Memo()
+        return self.__memo.store(k, state, text)
 
     def __init__(
         self,
         choices: 'bool | None' = None,
         default: 'bool | None' = None,
     ) -> 'None':
+        self.__revision = 0
         self.__choices = None
         self.__default = None
+        self.__memo = None
         self.choices = choices
         self.default = default
 
 
 class AppHelper:
+    __slots__ = (
+        '__lopt',
+        '__sopt',
+        '__help',
+        '__tree',
+        '__prof',
+        '__memo',
+        '__flags',
+        '__revision',
+    )
+
     @property
     def lopt(self) -> 'str':
         return self.__lopt
@@ -660,6 +1137,7 @@ class AppHelper:
         # Validate.
         raise_t(v, (str, type(None)), 'AppHelper.lopt')
         # Set.
+        self.__revision += 1
         self.__lopt = v or ''
 
     @property
@@ -676,6 +1154,7 @@ class AppHelper:
                 V,
                 'Must not exceed one character.')
         # Set.
+        self.__revision += 1
         self.__sopt = v or ''
 
     @property
@@ -687,50 +1166,103 @@ class AppHelper:
         # Validate.
         raise_t(v, (str, type(None)), 'AppHelper.help')
         # Set.
+        self.__revision += 1
         self.__help = v or ''
 
-    def text_help(
-        self,
+    @property
+    def tree(self) -> 'str':
+        return self.__tree
+
+    @tree.setter
+    def tree(self, v: 'str | None') -> 'None':
+        # Validate.
+        raise_t(v, (str, type(None)), 'AppHelper.tree')
+        # Set.
+        self.__revision += 1
+        self.__tree = v or ''
+
+    @property
+    def prof(self) -> 'str':
+        return self.__prof
+
+    @prof.setter
+    def prof(self, v: 'str | None') -> 'None':
+        # Validate.
+        raise_t(v, (str, type(None)), 'AppHelper.prof')
+        # Set.
+        self.__revision += 1
+        self.__prof = v or ''
+
+    @property
+    def revision(self) -> 'int':
+        return self.__revision
+
+    def text_help(
+        self,
         apps: 'list[App]',
         name: 'str',
     ) -> 'str':
-        parts = [self.text_usage(apps, name)]
-        parts.append(apps[-1].prolog)
-        parts.append(self.section_apps('Commands', apps[-1].apps))
-        args = [x for x in apps[-1].args if x.positional]
-        parts.append(self.section_args('Positional arguments', args))
-        args = [x for x in apps[-1].args if x.optional]
-        if self.sopt or self.lopt:
-            args.append(Arg(
-                lopt=self.lopt,
-                sopt=self.sopt,
-                help=self.help,
-                count=0,
-            ))
-        parts.append(self.section_args('Optional arguments', args))
-        parts.append(apps[-1].epilog)
-        parts = [x for x in parts if x]
-        return '\n\n'.join(parts) + '\n'
+        k = ('help', name, *apps)
+        state = self.__state(apps)
+        result = self.__memo.recall(k, state) if self.__memo else None
+        if result is not None:
+            return result
+        return self.__store(k, state, ''.join(self.__iter_help(apps, name)))
+
+    def iter_help(
+        self,
+        apps: 'list[App]',
+        name: 'str',
+    ) -> 'Iterator[str]':
+        # An overridden text_help is printed as is, like print() did before
+        # the streaming. Only the base implementation is streamed.
+        if type(self).text_help is not AppHelper.text_help:
+            yield self.text_help(apps, name)
+            return
+        yield from self.__iter_help(apps, name)
+
+    def __iter_help(
+        self,
+        apps: 'list[App]',
+        name: 'str',
+    ) -> 'Iterator[str]':
+        # The sections are rendered one at a time, separated by a blank line.
+        end = ''
+        for x in self.__sections(apps, name):
+            if x:
+                yield f'{end}{x}\n'
+                end = '\n'
+
+    def iter_tree(
+        self,
+        apps: 'list[App]',
+        name: 'str',
+    ) -> 'Iterator[str]':
+        # A single depth-first traversal, each command uses its own helper.
+        yield from self.iter_help(apps, name)
+        for app in apps[-1].apps:
+            yield '\n'
+            yield from app.helper.iter_tree(apps + [app], name)
 
     def text_usage(
         self,
         apps: 'list[App]',
         name: 'str',
     ) -> 'str':
-        names = [x.name for x in apps]
-        names[0] = names[0] or name
-        result = ' '.join(names)
+        k = ('usage', name, *apps)
+        state = self.__state(apps)
+        result = self.__memo.recall(k, state) if self.__memo else None
+        if result is not None:
+            return result
+        parts = [x.name for x in apps]
+        parts[0] = parts[0] or name
         args_opt = [x for x in apps[-1].args if x.required and x.optional]
         args_pos = [x for x in apps[-1].args if x.positional]
-        if args_opt:
-            result += ' ' + ' '.join(
-                [f'{{{x.helper.text_usage(x)}}}' for x in args_opt])
-        if args_pos:
-            result += ' ' + ' '.join(
-                [x.helper.text_usage(x) for x in args_pos])
+        parts.extend(f'{{{x.helper.text_usage(x)}}}' for x in args_opt)
+        parts.extend(x.helper.text_usage(x) for x in args_pos)
         if apps[-1].apps:
-            result += ' {...}'
-        return result
+            parts.append('{...}')
+        return self.__store(k, state, ' '.join(parts))
 
     def section_apps(
         self,
@@ -739,19 +1271,7 @@ class AppHelper:
     ) -> 'str':
         if not apps:
             return ''
-        result = f'{title}:' if title else ''
-        w = max(len(str(x.name)) for x in apps)
-        p = ' ' * (w + 6)
-        for app in apps:
-            if app.help:
-                result += f'\n  {app.name:{w}}'
-                lines = app.help.split('\n')
-                result += f'    {lines[0]}'
-                for i in range(1, len(lines)):
-                    result += f'\n{p}{lines[i]}'
-            else:
-                result += f'\n  {app.name}'
-        return result.lstrip('\n')
+        return self.__section(title, [(x.name, x.help) for x in apps])
 
     def section_args(
         self,
@@ -760,30 +1280,88 @@ class AppHelper:
     ) -> 'str':
         if not args:
             return ''
-        result = f'{title}:' if title else ''
         info = {x.helper.text_usage(x): x.helper.text_help(x) for x in args}
-        w = max(len(x) for x in info)
+        return self.__section(title, list(info.items()))
+
+    def __section(
+        self,
+        title: 'str',
+        items: 'list[tuple[str, str]]',
+    ) -> 'str':
+        lines = [f'{title}:'] if title else []
+        w = max(len(x) for x, _ in items)
         p = ' ' * (w + 6)
-        for name, help in info.items():
+        for name, help in items:
             if help:
-                result += f'\n  {name:{w}}'
-                lines = help.split('\n')
-                result += f'    {lines[0]}'
-                for i in range(1, len(lines)):
-                    result += f'\n{p}{lines[i]}'
+                text = help.split('\n')
+                lines.append(f'  {name:{w}}    {text[0]}')
+                lines.extend(p + x for x in text[1:])
             else:
-                result += f'\n  {name}'
-        return result.lstrip('\n')
+                lines.append(f'  {name}')
+        return '\n'.join(lines).lstrip('\n')
+
+    def __sections(
+        self,
+        apps: 'list[App]',
+        name: 'str',
+    ) -> 'Iterator[str]':
+        yield self.text_usage(apps, name)
+        yield apps[-1].prolog
+        yield self.section_apps('Commands', apps[-1].apps)
+        args = [x for x in apps[-1].args if x.positional]
+        yield self.section_args('Positional arguments', args)
+        args = [x for x in apps[-1].args if x.optional] + self.__flags_args()
+        yield self.section_args('Optional arguments', args)
+        yield apps[-1].epilog
+
+    def __flags_args(self) -> 'list[Arg]':
+        # The help options as flags for section_args. They are created once
+        # per revision of this helper, not on each rendering.
+        if self.__flags[0] == self.__revision:
+            return self.__flags[1]
+        args = []
+        if self.lopt or self.sopt:
+            args.append(Arg(lopt=self.lopt, sopt=self.sopt, help=self.help, count=0))
+        if self.tree:
+            args.append(Arg(
+                lopt=self.tree,
+                help='Show the help text for all commands and exit.',
+                count=0,
+            ))
+        self.__flags = (self.__revision, args)
+        return args
+
+    def __state(self, apps: 'list[App]') -> 'tuple':
+        # The revisions of everything the text is rendered from. The lists
+        # have no setters, so their items are compared too.
+        return (
+            self.__revision,
+            tuple(x.revision for x in apps),
+            tuple((x, x.revision, x.helper.revision) for x in apps[-1].args),
+            tuple((x, x.revision) for x in apps[-1].apps),
+        )
+
+    def __store(self, k: 'tuple', state: 'object', text: 'str') -> 'str':
+        if self.__memo is None:
+            self.__memo = Memo()
+        return self.__memo.store(k, state, text)
 
     def __init__(
         self,
         lopt: 'str | None' = 'help',
         sopt: 'str | None' = 'h',
         help: 'str | None' = 'Show the help text and exit.',
+        tree: 'str | None' = None,
+        prof: 'str | None' = None,
     ) -> 'None':
+        self.__revision = 0
+        self.__memo = None
+        self.__flags = (-1, [])
         self.lopt = lopt
         self.sopt = sopt
         self.help = help
+        self.tree = tree
+        self.prof = prof
 
 
 class CallError(RuntimeError):
@@ -826,27 +1404,453 @@ class CallError(RuntimeError):
         self.code = code
 
 
+class Runner:
+    __slots__ = (
+        '__app',
+        '__out',
+        '__err',
+        '__capture',
+        '__parser',
+    )
+
+    @property
+    def app(self) -> 'App':
+        return self.__app
+
+    @property
+    def out(self) -> 'str':
+        return self.__out
+
+    @property
+    def err(self) -> 'str':
+        return self.__err
+
+    def __init__(
+        self,
+        app: 'App',
+        lazy: 'bool' = False,
+        native: 'bool' = False,
+        capture: 'bool' = True,
+        abbrev: 'bool' = False,
+    ) -> 'None':
+        # Validate.
+        raise_t(app, App, 'Runner.app')
+        raise_t(lazy, bool, 'Runner.lazy')
+        raise_t(native, bool, 'Runner.native')
+        raise_t(capture, bool, 'Runner.capture')
+        raise_t(abbrev, bool, 'Runner.abbrev')
+        # Set.
+        if not app.name:
+            app.name = os.path.basename(sys.argv[0])
+        self.__app = app
+        self.__out = ''
+        self.__err = ''
+        self.__capture = capture
+        if native:
+            self.__parser = Engine(app, lazy, abbrev)
+        else:
+            self.__parser = Parser(
+                app.name,
+                apps=[app],
+                lazy=lazy,
+                abbrev=abbrev,
+                allow_abbrev=False,
+                add_help=False,
+            )
+
+    def parse(self, argv: 'list[str] | str') -> 'tuple[dict[Arg], list[App]]':
+        raise_t(argv, (list, str), 'Runner.parse')
+        if isinstance(argv, str):
+            argv = shlex.split(argv)
+        return self.__parser.parse([str(x) for x in argv])
+
+    def run(self, argv: 'list[str] | str') -> 'int':
+        raise_t(argv, (list, str), 'Runner.run')
+        streams = self.__hold()
+        try:
+            return self.__code(self.__call(self.__parse(argv)))
+        finally:
+            self.__release(streams)
+
+    async def run_async(self, argv: 'list[str] | str') -> 'int':
+        raise_t(argv, (list, str), 'Runner.run_async')
+        streams = self.__hold()
+        try:
+            return self.__code(await self.__call_async(self.__parse(argv)))
+        finally:
+            self.__release(streams)
+
+    def batch(
+        self,
+        argvs: 'Iterable[list[str] | str]',
+        call: 'bool' = False,
+        workers: 'int' = 0,
+        ordered: 'bool' = True,
+    ) -> 'Iterator[tuple[int, tuple[dict[Arg], list[App]] | CallError]]':
+        # Validate.
+        V = 'Runner.batch'
+        raise_t(argvs, Iterable, f'{V}.argvs')
+        raise_t(call, bool, f'{V}.call')
+        raise_t(workers, int, f'{V}.workers')
+        raise_v(workers, workers < 0, f'{V}.workers', 'Must be non-negative.')
+        raise_t(ordered, bool, f'{V}.ordered')
+        # The command lines are read and parsed as the results are consumed.
+        items = ((i, x, self.__parse(x)) for i, x in enumerate(argvs))
+        if call and workers:
+            return self.__batch_pool(items, workers, ordered)
+        return self.__batch(items, call)
+
+    def __hold(self) -> 'tuple':
+        # The streams to restore and the captured ones.
+        streams = (sys.stdout, sys.stderr, None, None)
+        if self.__capture:
+            sys.stdout = io.StringIO()
+            sys.stderr = io.StringIO()
+            streams = streams[:2] + (sys.stdout, sys.stderr)
+        return streams
+
+    def __release(self, streams: 'tuple') -> 'None':
+        sys.stdout, sys.stderr, out, err = streams
+        if self.__capture:
+            self.__out = out.getvalue()
+            self.__err = err.getvalue()
+
+    def __code(self, x: 'tuple | CallError | None') -> 'int':
+        # The same output as main, without the exit.
+        if not isinstance(x, CallError):
+            return 0
+        if x.text:
+            print(x.text, file=sys.stderr)
+        return x.code
+
+    def __parse(
+        self,
+        argv: 'list[str] | str',
+    ) -> 'tuple[dict[Arg], list[App]] | CallError':
+        # The help exits during the parsing, it is reported as CallError too.
+        try:
+            return self.parse(argv)
+        except CallError as e:
+            return e
+        except SystemExit as e:
+            return exit_error(e) or CallError(None, 0)
+
+    def __call(
+        self,
+        x: 'tuple[dict[Arg], list[App]] | CallError',
+    ) -> 'tuple[dict[Arg], list[App]] | CallError':
+        if not isinstance(x, tuple):
+            return x
+        try:
+            return execute(*x) or x
+        except SystemExit as e:
+            return exit_error(e) or x
+
+    async def __call_async(
+        self,
+        x: 'tuple[dict[Arg], list[App]] | CallError',
+    ) -> 'tuple[dict[Arg], list[App]] | CallError':
+        if not isinstance(x, tuple):
+            return x
+        try:
+            return await execute_async(*x) or x
+        except SystemExit as e:
+            return exit_error(e) or x
+
+    def __batch(
+        self,
+        items: 'Iterator[tuple]',
+        call: 'bool',
+    ) -> 'Iterator[tuple]':
+        for i, _, x in items:
+            yield (i, self.__call(x) if call else x)
+
+    def __batch_pool(
+        self,
+        items: 'Iterator[tuple]',
+        workers: 'int',
+        ordered: 'bool',
+    ) -> 'Iterator[tuple]':
+        # The pool processes inherit self by fork and parse the command lines
+        # again, only the command lines, the errors and the captured output are
+        # pickled. At most 16 results per worker are pending, so the input is
+        # read gradually.
+        import multiprocessing
+        import queue
+        done = queue.Queue()
+        parsed = {}
+        ready = {}
+        head = 0
+        count = 0
+        more = True
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers, init_batch, (self,)) as pool:
+            while more or count:
+                while more and count < workers * 16:
+                    try:
+                        i, argv, x = next(items)
+                    except StopIteration:
+                        more = False
+                        break
+                    count += 1
+                    if not isinstance(x, tuple):
+                        done.put((i, x))
+                        continue
+                    parsed[i] = x
+                    pool.apply_async(
+                        call_batch,
+                        (argv, self.__capture),
+                        callback=lambda v, i=i: done.put((i, v)),
+                        error_callback=lambda v, i=i: done.put((i, v)),
+                    )
+                if not count:
+                    break
+                i, x = done.get()
+                if isinstance(x, BaseException) and not isinstance(x, CallError):
+                    raise x
+                out = err = ''
+                if i in parsed:
+                    args = parsed.pop(i)
+                    e, out, err = x
+                    x = args if e is None else CallError(*e)
+                if not ordered:
+                    count -= 1
+                    yield (i, self.__deliver(x, out, err))
+                    continue
+                ready[i] = (x, out, err)
+                while head in ready:
+                    count -= 1
+                    yield (head, self.__deliver(*ready.pop(head)))
+                    head += 1
+
+    def __deliver(self, x: 'tuple | CallError', out: 'str', err: 'str') -> 'tuple | CallError':
+        # The captured output of a pool process is written with its result.
+        sys.stdout.write(out)
+        sys.stderr.write(err)
+        return x
+
+
+class Failure:
+    # A parsing error, built where it is detected by Parser or Scan. It is
+    # rendered to the CallError text once, see text().
+    __slots__ = ('kind', 'items', 'count', 'value', 'hints')
+
+    def __init__(
+        self,
+        kind: 'str',
+        items: 'Iterable[str]',
+        count: 'int | str | None' = None,
+        value: 'str | None' = None,
+        hints: 'list[list[str]] | None' = None,
+    ) -> 'None':
+        self.kind = kind
+        self.items = [x for x in items]
+        self.count = count
+        self.value = value
+        self.hints = hints or []
+
+    def text(self) -> 'str':
+        if self.kind == 'missing':
+            return f'Missing arguments: {", ".join(self.items)}.'
+        if self.kind == 'unknown':
+            return f'Unknown arguments: {", ".join(self.items)}.{hint(self.items, self.hints)}'
+        if self.kind == 'ambiguous':
+            return f'Ambiguous arguments: {", ".join(self.items)}.{hint(self.items, self.hints)}'
+        if self.kind == 'prefix':
+            return f'Ambiguous subcommand: {self.value}.{hint([self.value], self.hints)}'
+        if self.kind == 'values':
+            if self.count == 1:
+                count = 'one value'
+            elif self.count == '?':
+                count = 'at most one value'
+            elif self.count == '+':
+                count = 'at least one value'
+            else:
+                count = f'{self.count} values'
+            return f'{self.items[0]}: expected {count}.'
+        names = listed(self.items)
+        if self.kind == 'command':
+            return f'Missing subcommand. Choose from:{names}'
+        if len(self.items) > 2 * SUGGEST and any(self.hints):
+            return f'Invalid subcommand: {self.value}.{hint([self.value], self.hints)}'
+        return f'Invalid subcommand. Choose from:{names}'
+
+
+class Index:
+    # A trigram index of names for the suggestions. The rarest trigrams of
+    # a query pick the candidates within a budget, so a query costs the same
+    # for any number of names. Only the 2 * SUGGEST candidates that share the
+    # most trigrams are ranked by edit distance, a near name that shares fewer
+    # is missed, e.g. among many names with a long common part. The postings
+    # of all the trigrams are one array, a large index is stored as is, see
+    # index().
+    __slots__ = ('names', 'grams', 'bounds', 'ids')
+
+    def __init__(self, names: 'Iterable[str]') -> 'None':
+        import array
+        self.names = [x for x in dict.fromkeys(names)]
+        grams: 'dict[str, list[int]]' = {}
+        for i in range(len(self.names)):
+            for g in trigrams(self.names[i]):
+                if g in grams:
+                    grams[g].append(i)
+                else:
+                    grams[g] = [i]
+        # The postings of the k-th trigram are ids[bounds[k]:bounds[k + 1]].
+        self.grams: 'dict[str, int]' = {}
+        self.bounds: 'list[int]' = [0]
+        self.ids: 'array.array | memoryview' = array.array('I')
+        for g in grams:
+            self.grams[g] = len(self.grams)
+            self.ids.extend(grams[g])
+            self.bounds.append(len(self.ids))
+
+    def dump(self) -> 'tuple[str, list[str], bytes, bytes]':
+        import array
+        return (
+            '\0'.join(self.names),
+            [x for x in self.grams],
+            array.array('I', self.bounds).tobytes(),
+            self.ids.tobytes(),
+        )
+
+    @classmethod
+    def load(cls, state: 'tuple[str, list[str], bytes, bytes]') -> 'Index':
+        # The postings are a view of the stored bytes, they are not copied.
+        names, keys, bounds, ids = state
+        self = cls.__new__(cls)
+        self.names = names.split('\0')
+        self.grams = dict(zip(keys, range(len(keys))))
+        self.bounds = memoryview(bounds).cast('I').tolist()
+        self.ids = memoryview(ids).cast('I')
+        return self
+
+    def search(self, v: 'str') -> 'list[str]':
+        return [x for _, _, x in self.rank(v)]
+
+    def rank(self, v: 'str') -> 'list[tuple[int, int, str]]':
+        # The nearest names as (distance, -trigrams, name), the best first.
+        from collections import Counter
+        B = self.bounds
+        spans = sorted(
+            (B[k + 1] - B[k], B[k]) for k in map(self.grams.get, trigrams(v)) if k is not None)
+        counts = Counter()
+        budget = 2048
+        for n, i in spans:
+            if n > budget:
+                break
+            budget -= n
+            counts.update(self.ids[i:i + n])
+        limit = max(1, len(v) // 3)
+        found = []
+        for i, n in counts.most_common(2 * SUGGEST):
+            # An exact match is not a suggestion, e.g. an option after "--".
+            d = distance(v, self.names[i], limit)
+            if 0 < d <= limit:
+                found.append((d, -n, self.names[i]))
+        return sorted(found)[:SUGGEST]
+
+
+
+class Trie:
+    # The names by prefix, for the abbreviations. Each node keeps the names
+    # below it, so a lookup walks one node per character of the prefix.
+    __slots__ = ('root',)
+
+    def __init__(self, names: 'Iterable[str]') -> 'None':
+        self.root: 'tuple[dict, list[str]]' = ({}, [])
+        for x in dict.fromkeys(names):
+            node = self.root
+            for c in x:
+                if c not in node[0]:
+                    node[0][c] = ({}, [])
+                node = node[0][c]
+                node[1].append(x)
+
+    def match(self, v: 'str') -> 'list[str]':
+        node = self.root
+        for c in v:
+            node = node[0].get(c)
+            if node is None:
+                return []
+        return node[1]
+
+
+class Memo(dict):
+    # The rendered text with the state it was rendered at, see the callers.
+    def recall(self, k: 'tuple', state: 'object') -> 'str | None':
+        v = self.get(k)
+        if v is None or v[0] != state:
+            return None
+        return v[1]
+
+    def store(self, k: 'tuple', state: 'object', text: 'str') -> 'str':
+        self[k] = (state, text)
+        return text
+
+
 class Help(Action):
     def __init__(self, *args, **kwds) -> 'None':
         self.apps: 'list[App]' = kwds.pop('apps')
+        self.tree: 'bool' = kwds.pop('tree', False)
         super().__init__(*args, **kwds)
 
     def __call__(self, *args, **kwds) -> 'None':
-        print(self.apps[-1].helper.text_help(self.apps, ''))
+        helper = self.apps[-1].helper
+        if self.tree:
+            stream(helper.iter_tree(self.apps, ''))
+        else:
+            stream(helper.iter_help(self.apps, ''))
         sys.exit(0)
 
 
+class Finder(CompletionFinder):
+    def _get_subparser_completions(
+        self,
+        parser: 'ArgumentParser',
+        cword_prefix: 'str',
+    ) -> 'list[str]':
+        # Only the names, the lazy subparsers are not constructed.
+        return [x for x in parser.choices if x.startswith(cword_prefix)]
+
+
+class Parsers(dict):
+    def __init__(self, parser: 'Parser') -> 'None':
+        super().__init__()
+        self.parser = parser
+
+    def __getitem__(self, k: 'str') -> 'Parser':
+        v = super().__getitem__(k)
+        if isinstance(v, App):
+            v = self.parser.init_new_app(v)
+            super().__setitem__(k, v)
+        return v
+
+    def get(self, k: 'str', d: 'object' = None) -> 'Parser':
+        return self[k] if k in self else d
+
+    def values(self) -> 'list[Parser]':
+        return [self[x] for x in self]
+
+    def items(self) -> 'list[tuple[str, Parser]]':
+        return [(x, self[x]) for x in self]
+
+
 class Parser(ArgumentParser):
     def __init__(self, *args, **kwds) -> 'None':
         apps: 'list[App]' = [x for x in kwds.pop('apps')]
         self.apps = apps
+        self.lazy: 'bool' = kwds.pop('lazy', False)
+        # argparse abbreviations are disabled, see abbrev().
+        self.abbrev: 'bool' = kwds.pop('abbrev', False)
+        # The suggestion and abbreviation indexes, see suggest() and abbrev().
+        self.index: 'dict[str, Index | Trie]' = {}
         super().__init__(*args, **kwds)
         self.app = self.apps[-1]
+        self.key = key(self.apps)
         # Validate.
-        for i in range(len(self.app.apps)):
-            self.init_validate_app(i)
-        for i in range(len(self.app.args)):
-            self.init_validate_arg(i)
+        validate_apps(self.app)
+        validate_args(self.app)
         # Add help.
         args = []
         if self.app.helper.sopt:
@@ -855,137 +1859,150 @@ class Parser(ArgumentParser):
             args.append(f'--{self.app.helper.lopt}')
         if args:
             self.add_argument(*args, action=Help, nargs=0, apps=self.apps)
+        if self.app.helper.tree:
+            self.add_argument(
+                f'--{self.app.helper.tree}',
+                action=Help,
+                nargs=0,
+                apps=self.apps,
+                tree=True,
+            )
         # Add args.
-        for arg in self.app.args:
-            self.init_add_arg(arg)
+        self.required: 'list[tuple[str, str, bool]]' = []
+        for i in range(len(self.app.args)):
+            self.init_add_arg(i)
         # Add apps.
         if self.app.apps:
             self.sub = self.add_subparsers(
-                dest=str(id(self.app)),
+                dest=f'{self.key}/',
                 metavar='{...}',
             )
-            self.sub.required = True
+            # Parser.missing checks it.
+            self.sub.required = False
+            if self.lazy:
+                self.sub.choices = Parsers(self)
+                self.sub._name_parser_map = self.sub.choices
             for app in self.app.apps:
                 self.init_add_app(app)
 
     def parse(self, argv: 'list[str]') -> 'tuple[dict[Arg], list[App]]':
-        ns = self.parse_args(argv[1:])
+        ns, extras = self.parse_known_args(argv[1:])
         # apps
         apps: 'list[App]' = []
+        parsers: 'list[Parser]' = [self]
         cmd = self.app
+        vid = self.key
         while True:
             apps.append(cmd)
-            name = getattr(ns, str(id(cmd)), None)
+            name = getattr(ns, f'{vid}/', None)
             if name is None:
                 break
+            vid = f'{vid}/{name}'
+            parsers.append(parsers[-1].sub.choices[name])
             for app in cmd.apps:
                 if app.name == name:
                     cmd = app
                     break
+        if extras:
+            self.error(unknown(parsers, extras))
         # args
-        args: 'dict[Arg]' = {}
-        for app in apps:
-            for arg in app.args:
-                vid = str(id(arg))
-                if not hasattr(ns, vid):
-                    continue
-                v = getattr(ns, vid)
-                try:
-                    if arg.append:
-                        if arg.flag:
-                            args[arg] = arg(v or 0)
-                        else:
-                            args[arg] = arg(v or [])
-                    else:
-                        if arg.flag:
-                            args[arg] = arg(bool(v))
-                        else:
-                            args[arg] = arg(v if v != [] else None)
-                except CallError as e:
-                    self.error(e)
+        values: 'list[tuple[Arg, object]]' = []
+        for i in range(len(apps)):
+            vid = key(apps[:i + 1])
+            for j in range(len(apps[i].args)):
+                if hasattr(ns, f'{vid}:{j}'):
+                    values.append((apps[i].args[j], getattr(ns, f'{vid}:{j}')))
         # Return the result.
-        return (args, apps)
-
-    def error(self, message: 'str | CallError') -> 'None':
+        try:
+            return (convert(values), apps)
+        except CallError as e:
+            self.error(e)
+
+    def error(self, message: 'str | CallError | Failure') -> 'None':
+        # The argparse messages are passed as is, the errors that argapp
+        # reports differently are detected as Failure, see below.
         usage = self.app.helper.text_usage(self.apps, '')
         code = 1
         if isinstance(message, CallError):
             code = message.code
             message = message.text
-        elif 'arguments are required' in message:
-            message = self.error_missing(message)
-        elif 'unrecognized arguments' in message:
-            message = self.error_unknown(message)
-        elif 'invalid choice' in message:
-            message = self.error_choices(message)
-        elif 'expected' in message:
-            message = self.error_values(message)
+        elif isinstance(message, Failure):
+            message = message.text()
         raise CallError(f'{usage}\n\n{message}', code)
 
-    def init_validate_app(self, i: 'int') -> 'None':
-        topic = 'main'
-        app = self.app.apps[i]
-        raise_v(
-            value=self.app.name,
-            error=bool(not app.name),
-            topic=topic,
-            extra=f'apps[{i}].name is empty.',
-        )
-        for j in range(i + 1, len(self.app.apps)):
-            raise_v(
-                value=self.app.name,
-                error=(app.name == self.app.apps[j].name),
-                topic=topic,
-                extra=f'apps[{i}] and apps[{j}] have the same name: "{app.name}".',
-            )
-
-    def init_validate_arg(self, i: 'int') -> 'None':
-        topic = 'main'
+    def parse_known_args(
+        self,
+        args: 'list[str] | None' = None,
+        namespace: 'Namespace | None' = None,
+    ) -> 'tuple[Namespace, list[str]]':
+        # Like argparse, each subparser checks its own required arguments.
+        ns, extras = super().parse_known_args(args, namespace)
+        self.missing(vars(ns))
+        return (ns, extras)
+
+    def missing(self, ns: 'dict[str, object]') -> 'None':
+        # argparse does not mark any action as required, see init_add_arg.
+        # A positional that is seen is never None. A required optional has no
+        # default, it is in the namespace only if it is seen.
+        names = [x for k, x, o in self.required if (k not in ns if o else ns[k] is None)]
+        if names:
+            self.error(Failure('missing', names))
+        if self.app.apps and ns.get(f'{self.key}/') is None:
+            self.error(Failure('command', [x.name for x in self.app.apps]))
+
+    def _parse_optional(self, arg_string: 'str') -> 'tuple | list[tuple] | None':
+        # An unknown long option may be an unambiguous prefix. The shape of the
+        # result depends on the Python release: (action, option, value),
+        # (action, option, sep, value) or a list of the latter. It is kept.
+        result = super()._parse_optional(arg_string)
+        if not self.abbrev or result is None:
+            return result
+        item = result[0] if isinstance(result, list) else result
+        if len(result) != 1 and isinstance(result, list) or item[0] is not None:
+            return result
+        o, sep, e = arg_string.partition('=')
+        names = abbrev([self], 'opts', o)
+        if len(names) != 1:
+            return result
+        action = self._option_string_actions[names[0]]
+        if len(item) == 3:
+            item = (action, names[0], e if sep else None)
+        else:
+            item = (action, names[0], sep or None, e if sep else None)
+        return [item] if isinstance(result, list) else item
+
+    def _get_values(self, action: 'Action', arg_strings: 'list[str]') -> 'object':
+        # A subcommand may be an unambiguous prefix.
+        if self.abbrev and action is getattr(self, 'sub', None) and arg_strings:
+            name = arg_strings[0]
+            if name not in action.choices:
+                names = abbrev([self], 'apps', name)
+                if len(names) == 1:
+                    arg_strings = names + arg_strings[1:]
+                elif names:
+                    self.error(Failure('prefix', [], value=name, hints=[names]))
+        return super()._get_values(action, arg_strings)
+
+    def _check_value(self, action: 'Action', value: 'object') -> 'None':
+        # Only the subparsers have choices, Arg.choices are checked by Arg.
+        if action.choices is not None and value not in action.choices:
+            names = [x.name for x in self.app.apps]
+            hints = [suggest([self], 'apps', value)]
+            self.error(Failure('invalid', names, value=value, hints=hints))
+
+    def _match_argument(self, action: 'Action', arg_strings_pattern: 'str') -> 'int':
+        try:
+            return super()._match_argument(action, arg_strings_pattern)
+        except ArgumentError:
+            if ':' not in action.dest:
+                raise
+            arg = self.app.args[int(action.dest.split(':')[-1])]
+            self.error(Failure('values', [self.init_name(arg)], arg.count))
+
+    def init_add_arg(self, i: 'int') -> 'None':
         arg = self.app.args[i]
-        raise_v(
-            value=self.app.name,
-            error=bool(not arg.name),
-            topic=topic,
-            extra=f'args[{i}].name is empty.',
-        )
-        raise_v(
-            value=self.app.name,
-            error=(arg.lopt == self.app.helper.lopt and arg.lopt),
-            topic=topic,
-            extra=f'args[{i}] and help have the same lopt: "{arg.lopt}".',
-        )
-        raise_v(
-            value=self.app.name,
-            error=(arg.sopt == self.app.helper.sopt and arg.sopt),
-            topic=topic,
-            extra=f'args[{i}] and help have the same sopt: "{arg.sopt}".',
-        )
-        for j in range(i + 1, len(self.app.args)):
-            if arg.positional:
-                raise_v(
-                    value=self.app.name,
-                    error=(arg.name == self.app.args[j].name),
-                    topic=topic,
-                    extra=f'args[{i}] and args[{j}] have the same name: "{arg.name}".',
-                )
-                continue
-            raise_v(
-                value=self.app.name,
-                error=(arg.lopt == self.app.args[j].lopt and arg.lopt),
-                topic=topic,
-                extra=f'args[{i}] and args[{j}] have the same lopt: "{arg.lopt}".',
-            )
-
-            raise_v(
-                value=self.app.name,
-                error=(arg.sopt == self.app.args[j].sopt and arg.sopt),
-                topic=topic,
-                extra=f'args[{i}] and args[{j}] have the same sopt: "{arg.sopt}".',
-            )
-
-    def init_add_arg(self, arg: 'Arg') -> 'None':
         args = []
-        kwds = {'dest': str(id(arg))}
+        kwds = {'dest': f'{self.key}:{i}'}
         # lopt and sopt
         if arg.sopt:
             args.append(f'-{arg.sopt}')
@@ -1007,82 +2024,1828 @@ class Parser(ArgumentParser):
         # suppress
         if arg.suppress:
             kwds['default'] = SUPPRESS
-        # required
+        # required, see missing()
         if arg.optional and arg.required:
-            kwds['required'] = True
+            kwds['default'] = SUPPRESS
+            self.required.append((kwds['dest'], self.init_name(arg), True))
+        if arg.positional and arg.count != '?':
+            self.required.append((kwds['dest'], arg.name, False))
         # Add argument and set the completer.
-        self.add_argument(*args, **kwds).completer = arg.completer
+        action = self.add_argument(*args, **kwds)
+        action.completer = arg.completer
+        action.required = False
 
     def init_add_app(self, app: 'App') -> 'None':
+        if self.lazy:
+            # Only register the name, Parsers constructs on the first access.
+            dict.__setitem__(self.sub.choices, app.name, app)
+            return
         self.apps.append(app)
         self.sub.add_parser(
             app.name,
             apps=self.apps,
+            abbrev=self.abbrev,
             allow_abbrev=False,
             add_help=False,
         )
         self.apps.pop()
 
-    def error_missing(self, message: 'str') -> 'str':
-        names = message.split(':')[1].split(',')
-        names = [x.strip() for x in names]
-        if '{...}' in names:
-            names.remove('{...}')
-            if not names:
-                message = '\n * '.join(x.name for x in self.app.apps)
-                return f'Missing subcommand. Choose from:\n * {message}'
-        return f'Missing arguments: {", ".join(names)}.'
+    def init_new_app(self, app: 'App') -> 'Parser':
+        self.apps.append(app)
+        parser = Parser(
+            f'{self.sub._prog_prefix} {app.name}',
+            apps=self.apps,
+            lazy=self.lazy,
+            abbrev=self.abbrev,
+            allow_abbrev=False,
+            add_help=False,
+        )
+        self.apps.pop()
+        return parser
 
-    def error_choices(self, message: 'str') -> 'str':
-        message = '\n * '.join(x.name for x in self.app.apps)
-        return f'Invalid subcommand. Choose from:\n * {message}'
+    def init_name(self, arg: 'Arg') -> 'str':
+        # Like argparse names the action.
+        if arg.positional:
+            return arg.name
+        return '/'.join(x for x in [
+            f'-{arg.sopt}' if arg.sopt else '',
+            f'--{arg.lopt}' if arg.lopt else '',
+        ] if x)
 
-    def error_unknown(self, message: 'str') -> 'str':
-        names = message.split(':')[1].split(' ')[1:]
-        names = [x.strip() for x in names]
-        return f'Unknown arguments: {", ".join(names)}.'
 
-    def error_values(self, message: 'str') -> 'str':
-        parts = message.split(' ')
-        parts.pop(0)
-        parts[-1] = 'value' if parts[-1] == 'argument' else 'values'
-        return ' '.join(parts) + '.'
+class Cache:
+    def __init__(
+        self,
+        app: 'App',
+        argv: 'list[str]',
+        abbrev: 'bool' = False,
+    ) -> 'None':
+        # hashlib and pickle are imported only for the cache.
+        import hashlib
+        self.refs: 'dict[str, object]' = {}
+        self.ids: 'dict[int, str]' = {}
+        # The fingerprint covers everything Parser validates and translates.
+        stat = os.stat(__file__)
+        digest = hashlib.sha1(
+            f'{sys.hexversion} {stat.st_size} {stat.st_mtime_ns} {abbrev}'.encode())
+        self.init_walk([app], digest)
+        self.fingerprint = digest.hexdigest()
+        # The file is per script, it is overwritten if the fingerprint differs.
+        name = hashlib.sha1(os.path.abspath(argv[0]).encode()).hexdigest()
+        self.path = os.path.join(cache_root(), f'{app.name}-{name[:16]}.pickle')
+
+    def load(self) -> 'Parser | None':
+        import pickle
+        try:
+            with open(self.path, 'rb') as f:
+                if pickle.load(f) != self.fingerprint:
+                    return None
+                unpickler = pickle.Unpickler(f)
+                unpickler.persistent_load = self.persistent_load
+                return unpickler.load()
+        except Exception:
+            return None
+
+    def dump(self, parser: 'Parser') -> 'None':
+        import pickle
+        temp = f'{self.path}.{os.getpid()}'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp, 'wb') as f:
+                pickle.dump(self.fingerprint, f)
+                pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+                pickler.persistent_id = self.persistent_id
+                pickler.dump(parser)
+            os.replace(temp, self.path)
+        except Exception:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    def init_walk(self, apps: 'list[App]', digest: 'object') -> 'None':
+        app = apps[-1]
+        vid = key(apps)
+        self.init_ref(f'a{vid}', app)
+        digest.update(repr((
+            vid,
+            app.name,
+            app.helper.lopt,
+            app.helper.sopt,
+            app.helper.tree,
+            len(app.args),
+            len(app.apps),
+        )).encode())
+        for i in range(len(app.args)):
+            arg = app.args[i]
+            self.init_ref(f'c{vid}:{i}', arg.completer)
+            digest.update(repr((
+                arg.name,
+                arg.lopt,
+                arg.sopt,
+                arg.count,
+                arg.suppress,
+                arg.required,
+                arg.append,
+            )).encode())
+        for x in app.apps:
+            self.init_walk(apps + [x], digest)
+
+    def persistent_id(self, obj: 'object') -> 'str | None':
+        # App and Completer are stored as references to the live tree.
+        # argparse checks SUPPRESS by identity, a copy would be a default.
+        if obj is SUPPRESS:
+            return 'suppress'
+        if getattr(obj, '__qualname__', '').endswith('<locals>.identity'):
+            return 'identity'
+        return self.ids.get(id(obj))
+
+    def persistent_load(self, pid: 'str') -> 'object':
+        # argparse registers a local function for type=None, str is the same.
+        if pid == 'suppress':
+            return SUPPRESS
+        if pid == 'identity':
+            return str
+        return self.refs[pid]
+
+    def init_ref(self, pid: 'str', obj: 'object') -> 'None':
+        self.refs[pid] = obj
+        self.ids[id(obj)] = pid
+
+
+class Table:
+    negative = re.compile(r'^-\d+$|^-\d*\.\d+$')
+
+    def __init__(self, apps: 'list[App]', abbrev: 'bool' = False) -> 'None':
+        self.apps = [x for x in apps]
+        self.app = self.apps[-1]
+        self.abbrev = abbrev
+        # Validate.
+        validate_apps(self.app)
+        validate_args(self.app)
+        # Lookup tables. self.app stands for the subcommand positional.
+        self.opts: 'dict[str, Arg | AppHelper]' = {}
+        self.names: 'dict[Arg | AppHelper | App, str]' = {self.app: '{...}'}
+        self.counts: 'dict[Arg | AppHelper | App, tuple]' = {self.app: (1, None)}
+        self.cmds: 'dict[str, App]' = {x.name: x for x in self.app.apps}
+        self.subs: 'dict[str, Table]' = {}
+        self.args: 'list[Arg | App]' = []
+        self.required: 'list[Arg | App]' = []
+        self.init_add(self.app.helper, self.app.helper.sopt, self.app.helper.lopt)
+        # The tree help is a flag that is checked by identity, see Scan.store.
+        self.tree: 'Arg | None' = None
+        if self.app.helper.tree:
+            self.tree = Arg(lopt=self.app.helper.tree, count=0)
+            self.init_add(self.tree, '', self.tree.lopt)
+        for arg in self.app.args:
+            self.init_add(arg, arg.sopt, arg.lopt)
+            if arg.positional:
+                self.args.append(arg)
+            if (arg.optional and arg.required) or (arg.positional and arg.count != '?'):
+                self.required.append(arg)
+        if self.cmds:
+            self.args.append(self.app)
+            self.required.append(self.app)
+        # The argparse patterns of the positionals, see Scan.positionals.
+        # The compiled ones are by the first positional and the count.
+        self.patterns: 'list[str]' = [self.init_pattern(x) for x in self.args]
+        self.regexes: 'dict[tuple[int, int], re.Pattern]' = {}
+        # Whether a '~' positional is at or after the index.
+        self.rest: 'list[bool]' = [
+            any(x is not self.app and x.count == '~' for x in self.args[i:])
+            for i in range(len(self.args) + 1)
+        ]
+        self.numbers = any(self.negative.match(x) for x in self.opts)
+        # The suggestion and abbreviation indexes, see suggest() and abbrev().
+        self.index: 'dict[str, Index | Trie]' = {}
+
+    def sub(self, name: 'str') -> 'Table':
+        if name not in self.subs:
+            self.subs[name] = Table(self.apps + [self.cmds[name]], self.abbrev)
+        return self.subs[name]
+
+    def match(self, v: 'str') -> 'tuple | None':
+        # The same rules as argparse without abbreviations.
+        # None is a positional, (None, v, None) is an unknown option.
+        if not v or v[0] != '-':
+            return None
+        if v in self.opts:
+            return (self.opts[v], v, None)
+        if len(v) == 1:
+            return None
+        if '=' in v:
+            o, e = v.split('=', 1)
+            if o in self.opts:
+                return (self.opts[o], o, e)
+        if v[1] != '-' and v[:2] in self.opts:
+            return (self.opts[v[:2]], v[:2], v[2:])
+        if self.negative.match(v) and not self.numbers:
+            return None
+        if ' ' in v:
+            return None
+        if self.abbrev:
+            o, _, e = v.partition('=')
+            names = abbrev([self], 'opts', o)
+            if len(names) == 1:
+                return (self.opts[names[0]], names[0], e if _ else None)
+        return (None, v, None)
+
+    def error(self, message: 'str | Failure', code: 'int' = 1) -> 'None':
+        usage = self.app.helper.text_usage(self.apps, '')
+        if isinstance(message, Failure):
+            message = message.text()
+        raise CallError(f'{usage}\n\n{message}', code)
+
+    def init_add(self, x: 'Arg | AppHelper', sopt: 'str', lopt: 'str') -> 'None':
+        opts = []
+        if sopt:
+            opts.append(f'-{sopt}')
+        if lopt:
+            opts.append(f'--{lopt}')
+        for o in opts:
+            self.opts[o] = x
+        if isinstance(x, AppHelper):
+            self.counts[x] = (0, 0)
+        elif isinstance(x.count, int):
+            self.counts[x] = (x.count, x.count)
+        else:
+            self.counts[x] = {
+                '?': (0, 1),
+                '*': (0, None),
+                '+': (1, None),
+                '~': (0, None),
+            }[x.count]
+        self.names[x] = '/'.join(opts) or x.name
+
+    def regex(self, k: 'int', n: 'int') -> 're.Pattern':
+        if (k, n) not in self.regexes:
+            self.regexes[(k, n)] = re.compile(''.join(self.patterns[k:k + n]))
+        return self.regexes[(k, n)]
+
+    def init_pattern(self, x: 'Arg | App') -> 'str':
+        # The same as ArgumentParser._get_nargs_pattern for positionals.
+        if x is self.app:
+            return '(-*A[-AO]*)'
+        if isinstance(x.count, int):
+            return f'(-*{"-*".join("A" * x.count)}-*)'
+        return {
+            '?': '(-*A?-*)',
+            '*': '(-*[A-]*)',
+            '+': '(-*A[A-]*)',
+            '~': '([-AO]*)',
+        }[x.count]
+
+
+class Scan:
+    def __init__(
+        self,
+        table: 'Table',
+        tokens: 'list[str]',
+        levels: 'list[tuple[App, dict[Arg]]]',
+        extras: 'list[str]',
+    ) -> 'None':
+        self.table = table
+        self.tokens = tokens
+        self.extras = extras
+        self.levels = levels
+        self.apps = table.apps
+        self.todo = [x for x in table.args]
+        self.seen: 'set[Arg | App]' = set()
+        # The values are in the argparse format, see convert().
+        self.raw: 'dict[Arg]' = {}
+        for arg in table.app.args:
+            if not arg.suppress:
+                self.raw[arg] = False if arg.flag and not arg.append else None
+        levels.append((table.app, self.raw))
+
+    def run(self) -> 'list[App]':
+        chunk: 'list[str]' = []
+        # The index of "--" in chunk, the options are not parsed after it.
+        d = -1
+        i = 0
+        while i < len(self.tokens):
+            v = self.tokens[i]
+            if d < 0 and v == '--':
+                d = len(chunk)
+                chunk.append(v)
+                i += 1
+                continue
+            m = None if d >= 0 else self.table.match(v)
+            if m is None:
+                chunk.append(v)
+                i += 1
+                continue
+            if chunk:
+                # '~' may take the options too, then the scan resumes after them.
+                j = self.positionals(chunk, d, i)
+                chunk = []
+                if j > i:
+                    i = j
+                    continue
+            i = self.optional(m, i)
+        else:
+            self.positionals(chunk, d, i)
+        self.missing()
+        return self.apps
+
+    def positionals(self, chunk: 'list[str]', d: 'int', i: 'int') -> 'int':
+        # The same matching as argparse: the longest prefix of the positionals
+        # whose patterns match, each one is greedy. The tokens after the chunk
+        # are classified only for '~', the other patterns stop at an option.
+        # Returns the index of the first token that is not consumed.
+        if not self.todo:
+            self.extras.extend(chunk)
+            return i
+        k = len(self.table.args) - len(self.todo)
+        pattern = ['A'] * len(chunk)
+        if d >= 0:
+            pattern[d] = '-'
+        rest = chunk + self.tokens[i:]
+        if self.table.rest[k]:
+            dash = d >= 0
+            for v in self.tokens[i:]:
+                if dash:
+                    pattern.append('A')
+                elif v == '--':
+                    dash = True
+                    pattern.append('-')
+                else:
+                    pattern.append('A' if self.table.match(v) is None else 'O')
+        pattern = ''.join(pattern)
+        found = None
+        for n in range(len(self.todo), 0, -1):
+            found = self.table.regex(k, n).match(pattern)
+            if found:
+                break
+        sizes = [len(x) for x in found.groups()] if found else []
+        todo = self.todo[:len(sizes)]
+        self.todo = self.todo[len(sizes):]
+        p = 0
+        for x, size in zip(todo, sizes):
+            self.seen.add(x)
+            v = rest[p:p + size]
+            # The rest of the command line, including the options.
+            if x is self.table.app:
+                self.command(v[0], rest[p + 1:])
+                return len(self.tokens)
+            p += size
+            if x.count == '~':
+                self.raw[x] = v
+                continue
+            # Like in argparse, the first "--" is dropped from the values.
+            if '--' in v:
+                v.remove('--')
+            # A single value unless "--" was the only one, as in argparse.
+            if len(v) == 1 and (x.count == 1 or x.count == '?'):
+                self.raw[x] = v[0]
+            elif x.count == '?':
+                self.raw[x] = None
+            else:
+                self.raw[x] = v
+        if p < len(chunk):
+            self.extras.extend(chunk[p:])
+            return i
+        return i + p - len(chunk)
+
+    def optional(self, m: 'tuple', i: 'int') -> 'int':
+        x, o, e = m
+        if x is None:
+            self.extras.append(self.tokens[i])
+            return i + 1
+        found = []
+        stop = i + 1
+        while True:
+            lo, hi = self.table.counts[x]
+            if e is None:
+                while stop < len(self.tokens) and (hi is None or stop - i - 1 < hi):
+                    v = self.tokens[stop]
+                    if v == '--' or self.table.match(v) is not None:
+                        break
+                    stop += 1
+                if stop - i - 1 < lo:
+                    self.error_values(x)
+                found.append((x, self.tokens[i + 1:stop]))
+                break
+            # Combined flags, like -abc.
+            if hi == 0 and o[1] != '-' and e != '':
+                found.append((x, []))
+                o = f'-{e[0]}'
+                if o not in self.table.opts:
+                    self.error_ignored(x, e)
+                x = self.table.opts[o]
+                e = e[1:] or None
+                continue
+            if hi == 0:
+                self.error_ignored(x, e)
+            if lo > 1:
+                self.error_values(x)
+            found.append((x, [e]))
+            break
+        for x, v in found:
+            self.store(x, v)
+        return stop
+
+    def command(self, name: 'str', tokens: 'list[str]') -> 'None':
+        if name not in self.table.cmds and self.table.abbrev:
+            names = abbrev([self.table], 'apps', name)
+            if len(names) == 1:
+                name = names[0]
+            elif names:
+                self.table.error(Failure('prefix', [], value=name, hints=[names]))
+        if name not in self.table.cmds:
+            hints = [suggest([self.table], 'apps', name)]
+            self.table.error(Failure('invalid', self.table.cmds, value=name, hints=hints))
+        scan = Scan(self.table.sub(name), tokens, self.levels, self.extras)
+        self.apps = scan.run()
+
+    def store(self, x: 'Arg | AppHelper', v: 'list[str]') -> 'None':
+        if isinstance(x, AppHelper):
+            stream(x.iter_help(self.table.apps, ''))
+            sys.exit(0)
+        if x is self.table.tree:
+            stream(self.table.app.helper.iter_tree(self.table.apps, ''))
+            sys.exit(0)
+        self.seen.add(x)
+        if x.flag:
+            self.raw[x] = (self.raw.get(x) or 0) + 1 if x.append else True
+            return
+        if not x.multiple:
+            v = v[0] if v else None
+        if not x.append:
+            self.raw[x] = v
+        elif self.raw.get(x) is None:
+            self.raw[x] = [v]
+        else:
+            self.raw[x].append(v)
+
+    def missing(self) -> 'None':
+        missing = [x for x in self.table.required if x not in self.seen]
+        if not missing:
+            return
+        if missing == [self.table.app]:
+            self.table.error(Failure('command', self.table.cmds))
+        names = [self.table.names[x] for x in missing if x is not self.table.app]
+        self.table.error(Failure('missing', names))
+
+    def error_values(self, x: 'Arg') -> 'None':
+        self.table.error(Failure('values', [self.table.names[x]], x.count))
+
+    def error_ignored(self, x: 'Arg | AppHelper', e: 'str') -> 'None':
+        self.table.error(
+            f'argument {self.table.names[x]}: ignored explicit argument {e!r}')
+
+
+class Engine:
+    def __init__(self, app: 'App', lazy: 'bool' = False, abbrev: 'bool' = False) -> 'None':
+        self.table = Table([app], abbrev)
+        if not lazy:
+            self.init_walk(self.table)
+
+    def parse(self, argv: 'list[str]') -> 'tuple[dict[Arg], list[App]]':
+        levels: 'list[tuple[App, dict[Arg]]]' = []
+        extras: 'list[str]' = []
+        apps = Scan(self.table, argv[1:], levels, extras).run()
+        if extras:
+            tables = [self.table]
+            for app in apps[1:]:
+                tables.append(tables[-1].sub(app.name))
+            self.table.error(unknown(tables, extras))
+        values: 'list[tuple[Arg, object]]' = []
+        for app, raw in levels:
+            for arg in app.args:
+                if arg in raw:
+                    values.append((arg, raw[arg]))
+        try:
+            return (convert(values), apps)
+        except CallError as e:
+            self.table.error(e.text, e.code)
+
+    def init_walk(self, table: 'Table') -> 'None':
+        for name in table.cmds:
+            self.init_walk(table.sub(name))
+
+
+class Script:
+    # The walkers are the same for every command, FUNC is the function prefix.
+    bash = r'''
+FUNC() {
+    local line=${COMP_LINE:0:COMP_POINT} node=0 pos=0 got=0 left=0 more=0 dash=0
+    local kind=n cur n k i w
+    local -a words list
+    read -ra words <<< "$line"
+    if [[ ${#words[@]} == 0 || $line == *[[:space:]] ]]; then
+        words+=('')
+    fi
+    cur=${words[${#words[@]} - 1]}
+    COMPREPLY=()
+    for ((i = 1; i < ${#words[@]} - 1; i++)); do
+        w=${words[i]}
+        if ((left > 0)); then
+            left=$((left - 1))
+            continue
+        fi
+        if ((more)) && [[ $dash == 1 || $w != -?* ]]; then
+            continue
+        fi
+        more=0
+        kind=n
+        if ((dash == 0)) && [[ $w == -- ]]; then
+            dash=1
+        elif ((dash == 0)) && [[ $w == -?* ]]; then
+            if FUNC_opt $node "${w%%=*}" && [[ $w != *=* ]]; then
+                kind=$k
+                case $n in
+                    [0-9]*) left=$n ;;
+                    *) more=1 ;;
+                esac
+            fi
+        elif FUNC_cmd $node "$w"; then
+            pos=0
+            got=0
+        elif FUNC_pos $node $pos; then
+            case $n in
+                '~') dash=1; break ;;
+                [0-9]*) got=$((got + 1)) ;;
+            esac
+            if [[ $n == [0-9]* ]] && ((got >= n)); then
+                pos=$((pos + 1))
+                got=0
+            fi
+        fi
+    done
+    if ((dash == 0)) && FUNC_pos $node $pos && [[ $n == '~' ]]; then
+        dash=1
+    fi
+    if ((left > 0)) || { ((more)) && [[ $dash == 1 || $cur != -* ]]; }; then
+        :
+    elif ((dash == 0)) && [[ $cur == -* ]]; then
+        kind=n
+        if [[ $cur == *=* ]] && FUNC_opt $node "${cur%%=*}" && [[ $n != 0 ]]; then
+            kind=$k
+            cur=${cur#*=}
+        else
+            FUNC_list o$node
+        fi
+    elif FUNC_pos $node $pos; then
+        kind=$k
+    else
+        kind=n
+        FUNC_list s$node
+    fi
+    case $kind in
+        f)
+            compopt -o filenames 2> /dev/null
+            while IFS= read -r w; do
+                COMPREPLY+=("$w")
+            done < <(compgen -f -- "$cur")
+            ;;
+        p)
+            local IFS=$'\013' out
+            if out=$(FUNC_ask "$COMP_LINE" "$COMP_POINT"); then
+                COMPREPLY=($out)
+            else
+                COMPREPLY=($(COMP_LINE=$COMP_LINE COMP_POINT=$COMP_POINT \
+                    _ARGCOMPLETE=1 _ARGCOMPLETE_SUPPRESS_SPACE=1 \
+                    "${words[0]}" 8>&1 9> /dev/null))
+            fi
+            ;;
+        c*)
+            FUNC_list $kind
+            ;;
+    esac
+    for w in "${list[@]}"; do
+        if [[ $w == "$cur"* ]]; then
+            COMPREPLY+=("$w")
+        fi
+    done
+}
+'''
+    zsh = r'''
+FUNC() {
+    emulate -L zsh
+    local node=0 pos=0 got=0 left=0 more=0 dash=0 kind=n cur=${(Q)PREFIX} n k i w out
+    local -a list reply
+    for ((i = 2; i < CURRENT; i++)); do
+        w=${(Q)words[i]}
+        if ((left > 0)); then
+            left=$((left - 1))
+            continue
+        fi
+        if ((more)) && [[ $dash == 1 || $w != -?* ]]; then
+            continue
+        fi
+        more=0
+        kind=n
+        if ((dash == 0)) && [[ $w == -- ]]; then
+            dash=1
+        elif ((dash == 0)) && [[ $w == -?* ]]; then
+            if FUNC_opt $node "${w%%=*}" && [[ $w != *=* ]]; then
+                kind=$k
+                case $n in
+                    [0-9]*) left=$n ;;
+                    *) more=1 ;;
+                esac
+            fi
+        elif FUNC_cmd $node "$w"; then
+            pos=0
+            got=0
+        elif FUNC_pos $node $pos; then
+            case $n in
+                '~') dash=1; break ;;
+                [0-9]*) got=$((got + 1)) ;;
+            esac
+            if [[ $n == [0-9]* ]] && ((got >= n)); then
+                pos=$((pos + 1))
+                got=0
+            fi
+        fi
+    done
+    if ((dash == 0)) && FUNC_pos $node $pos && [[ $n == '~' ]]; then
+        dash=1
+    fi
+    if ((left > 0)) || { ((more)) && [[ $dash == 1 || $cur != -* ]]; }; then
+        :
+    elif ((dash == 0)) && [[ $cur == -* ]]; then
+        kind=n
+        if [[ $cur == *=* ]] && FUNC_opt $node "${cur%%=*}" && [[ $n != 0 ]]; then
+            kind=$k
+            compset -P '*='
+        else
+            FUNC_list o$node
+        fi
+    elif FUNC_pos $node $pos; then
+        kind=$k
+    else
+        kind=n
+        FUNC_list s$node
+    fi
+    case $kind in
+        f)
+            _files
+            ;;
+        p)
+            if out=$(FUNC_ask "$BUFFER" "$CURSOR"); then
+                reply=(${(ps:\v:)out})
+            else
+                reply=(${(ps:\v:)"$(COMP_LINE=$BUFFER COMP_POINT=$CURSOR \
+                    _ARGCOMPLETE=1 _ARGCOMPLETE_SUPPRESS_SPACE=1 \
+                    ${(Q)words[1]} 8>&1 9> /dev/null)"})
+            fi
+            compadd -Q -a reply
+            ;;
+        c*)
+            FUNC_list $kind
+            ;;
+    esac
+    compadd -a list
+}
+'''
+    fish = r'''
+function FUNC
+    set -l words (commandline -opc)
+    set -l cmd $words[1]
+    set -l cur (commandline -ct)
+    set -l node 0
+    set -l pos 0
+    set -l got 0
+    set -l left 0
+    set -l more 0
+    set -l dash 0
+    set -l kind n
+    set -l prefix
+    set -l list
+    set -l r
+    set -e words[1]
+    for w in $words
+        if test $left -gt 0
+            set left (math $left - 1)
+            continue
+        end
+        if test $more = 1
+            if test $dash = 1; or not string match -q -- '-?*' $w
+                continue
+            end
+        end
+        set more 0
+        set kind n
+        if test $dash = 0; and test "$w" = --
+            set dash 1
+        else if test $dash = 0; and string match -q -- '-?*' $w
+            if set r (FUNC_opt $node (string split -m 1 = -- $w)[1])
+                if not string match -q -- '*=*' $w
+                    set kind $r[2]
+                    if string match -qr -- '^[0-9]+$' $r[1]
+                        set left $r[1]
+                    else
+                        set more 1
+                    end
+                end
+            end
+        else if set r (FUNC_cmd $node $w)
+            set node $r[1]
+            set pos 0
+            set got 0
+        else if set r (FUNC_pos $node $pos)
+            if test $r[1] = '~'
+                set dash 1
+                break
+            else if string match -qr -- '^[0-9]+$' $r[1]
+                set got (math $got + 1)
+                if test $got -ge $r[1]
+                    set pos (math $pos + 1)
+                    set got 0
+                end
+            end
+        end
+    end
+    if test $dash = 0; and set r (FUNC_pos $node $pos); and test $r[1] = '~'
+        set dash 1
+    end
+    if test $left -gt 0; or begin
+            test $more = 1
+            and begin
+                test $dash = 1; or not string match -q -- '-*' $cur
+            end
+        end
+    else if test $dash = 0; and string match -q -- '-*' $cur
+        set kind n
+        set -l o (string split -m 1 = -- $cur)
+        if set -q o[2]; and set r (FUNC_opt $node $o[1]); and test $r[1] != 0
+            set kind $r[2]
+            set prefix $o[1]=
+            set cur $o[2]
+        else
+            set list (FUNC_list o$node)
+        end
+    else if set r (FUNC_pos $node $pos)
+        set kind $r[2]
+    else
+        set kind n
+        set list (FUNC_list s$node)
+    end
+    switch $kind
+        case f
+            set list (__fish_complete_path $cur)
+        case p
+            set -l line (commandline -cp)
+            if not FUNC_ask $line (string length -- $line)
+                COMP_LINE=$line COMP_POINT=(string length -- $line) \
+                    _ARGCOMPLETE=1 _ARGCOMPLETE_SUPPRESS_SPACE=1 _ARGCOMPLETE_SHELL=fish \
+                    _ARGCOMPLETE_IFS=\n _ARGCOMPLETE_STDOUT_FILENAME=/dev/stdout $cmd
+            end
+        case 'c*'
+            set list (FUNC_list $kind)
+    end
+    for x in $list
+        echo $prefix$x
+    end
+end
+'''
+
+    # The completion daemon is asked first, if its socket exists.
+    ask = r'''
+FUNC_ask() {
+    local sock=${XDG_RUNTIME_DIR:-/tmp}/argapp-$UID/SOCK out
+    if [[ ! -S $sock || ! -O $sock || ! -O ${sock%/*} ]]; then
+        return 1
+    fi
+    if command -v socat > /dev/null; then
+        out=$(printf '%s\0' "$PWD" "$1" "$2" $'\013' bash |
+            socat - "UNIX-CONNECT:$sock" 2> /dev/null)
+    else
+        out=$(printf '%s\0' "$PWD" "$1" "$2" $'\013' bash |
+            nc -U "$sock" 2> /dev/null)
+    fi
+    [[ $out == +* ]] && printf '%s' "${out#+}"
+}'''
+    ask_fish = r'''
+function FUNC_ask
+    set -l root /tmp
+    set -q XDG_RUNTIME_DIR; and set root $XDG_RUNTIME_DIR
+    set -l sock $root/argapp-(id -u)/SOCK
+    test -S $sock -a -O $sock -a -O (dirname $sock); or return 1
+    set -l client socat - UNIX-CONNECT:$sock
+    command -q socat; or set client nc -U $sock
+    set -l out (printf '%s\0' $PWD $argv[1] $argv[2] \n fish | $client 2> /dev/null)
+    string match -q -- '+*' "$out[1]"; or return 1
+    set out[1] (string sub -s 2 -- $out[1])
+    string match -v -- '' $out
+    return 0
+end'''
+
+    def __init__(self, app: 'App', script: 'str') -> 'None':
+        self.name = app.name
+        self.func = '_argapp_' + re.sub(r'\W', '_', app.name)
+        self.sock = socket_name(app, script)
+        # Node is the index of an App in the depth-first order.
+        self.opts: 'list[tuple[int, str, str, str]]' = []
+        self.cmds: 'list[tuple[int, str, int]]' = []
+        self.poss: 'list[tuple[int, int, str, str]]' = []
+        self.lists: 'dict[str, list[str]]' = {}
+        self.choices: 'dict[tuple[str], str]' = {}
+        self.nodes = 0
+        self.init_walk(app)
+
+    def text(self, shell: 'str') -> 'str':
+        head = f'# {shell} completion for {self.name}, generated by argapp.\n'
+        if shell == 'fish':
+            tail = f"complete -c {self.quote(self.name)} -f -a '({self.func})'\n"
+            body = self.ask_fish + self.fish
+            return head + self.text_fish() + self.text_body(body) + tail
+        tail = {
+            'bash': f'complete -F {self.func} {shlex.quote(self.name)}\n',
+            'zsh': f'compdef {self.func} {shlex.quote(self.name)}\n',
+        }[shell]
+        body = self.ask + getattr(self, shell)
+        return head + self.text_sh() + self.text_body(body) + tail
+
+    def text_body(self, body: 'str') -> 'str':
+        return body.replace('FUNC', self.func).replace('SOCK', self.sock)
+
+    def text_sh(self) -> 'str':
+        # Case lookups are shared by bash and zsh, quoted patterns are literal.
+        lines = [f'{self.func}_opt() {{', '    case "$1 $2" in']
+        for node, o, n, k in self.opts:
+            lines.append(f'        {shlex.quote(f"{node} {o}")}) n={n} k={k} ;;')
+        lines += ['        *) return 1 ;;', '    esac', '}']
+        lines += [f'{self.func}_cmd() {{', '    case "$1 $2" in']
+        for node, name, sub in self.cmds:
+            lines.append(f'        {shlex.quote(f"{node} {name}")}) node={sub} ;;')
+        lines += ['        *) return 1 ;;', '    esac', '}']
+        lines += [f'{self.func}_pos() {{', '    case "$1 $2" in']
+        for node, i, n, k in self.poss:
+            lines.append(f"        '{node} {i}') n='{n}' k={k} ;;")
+        lines += ['        *) return 1 ;;', '    esac', '}']
+        lines += [f'{self.func}_list() {{', '    case $1 in']
+        for k, v in self.lists.items():
+            if not v:
+                continue
+            lines.append(f'        {k}) list=({" ".join(shlex.quote(x) for x in v)}) ;;')
+        lines += ['    esac', '}']
+        return '\n'.join(lines)
+
+    def text_fish(self) -> 'str':
+        # Names are looked up with contains, switch patterns are wildcards.
+        lines = []
+        for func, table in [
+            ('opt', [(x[0], x[1], f'{x[2]} {x[3]}') for x in self.opts]),
+            ('cmd', self.cmds),
+        ]:
+            lines += [
+                f'function {self.func}_{func}',
+                '    set -l o',
+                '    set -l v',
+                '    switch $argv[1]',
+            ]
+            nodes: 'dict[int, list]' = {}
+            for node, name, v in table:
+                nodes.setdefault(node, []).append((name, str(v)))
+            for node, items in nodes.items():
+                lines += [
+                    f'        case {node}',
+                    f'            set o {" ".join(self.quote(x[0]) for x in items)}',
+                    f'            set v {" ".join(self.quote(x[1]) for x in items)}',
+                ]
+            lines += [
+                '    end',
+                '    set -l i (contains -i -- $argv[2] $o); or return 1',
+                "    string split ' ' -- $v[$i]",
+                'end',
+            ]
+        lines += [
+            f'function {self.func}_pos',
+            "    switch \"$argv[1] $argv[2]\"",
+        ]
+        for node, i, n, k in self.poss:
+            lines += [f"        case '{node} {i}'", f"            printf '%s\\n' '{n}' {k}"]
+        lines += ["        case '*'", '            return 1', '    end', 'end']
+        lines += [f'function {self.func}_list', '    switch $argv[1]']
+        for k, v in self.lists.items():
+            if not v:
+                continue
+            lines += [
+                f'        case {k}',
+                f'            printf \'%s\\n\' {" ".join(self.quote(x) for x in v)}',
+            ]
+        lines += ['    end', 'end']
+        return '\n'.join(lines)
+
+    def quote(self, v: 'str') -> 'str':
+        # fish single quotes only have \\ and \' escapes.
+        v = v.replace('\\', '\\\\').replace("'", "\\'")
+        return f"'{v}'"
+
+    def init_walk(self, app: 'App') -> 'int':
+        node = self.nodes
+        self.nodes += 1
+        validate_apps(app)
+        validate_args(app)
+        opts = self.lists[f'o{node}'] = []
+        cmds = self.lists[f's{node}'] = []
+        for o in self.init_opts(app.helper.sopt, app.helper.lopt) + \
+                self.init_opts('', app.helper.tree):
+            opts.append(o)
+            self.opts.append((node, o, '0', 'n'))
+        i = 0
+        for arg in app.args:
+            n, k = self.init_value(arg)
+            if arg.positional:
+                # '?' takes at most one word, the next one is for the next positional.
+                self.poss.append((node, i, '1' if arg.count == '?' else n, k))
+                i += 1
+            for o in self.init_opts(arg.sopt, arg.lopt):
+                opts.append(o)
+                self.opts.append((node, o, n, k))
+        for x in app.apps:
+            cmds.append(x.name)
+            self.cmds.append((node, x.name, self.init_walk(x)))
+        return node
+
+    def init_opts(self, sopt: 'str', lopt: 'str') -> 'list[str]':
+        opts = []
+        if sopt:
+            opts.append(f'-{sopt}')
+        if lopt:
+            opts.append(f'--{lopt}')
+        return opts
+
+    def init_value(self, arg: 'Arg') -> 'tuple[str, str]':
+        # n is the number of values or *, k is the kind of the completion:
+        # n - none, f - files, p - Python, c<i> - the list c<i>.
+        if arg.flag:
+            return ('0', 'n')
+        n = str(arg.count) if isinstance(arg.count, int) else '*'
+        if arg.count == '~':
+            n = '~'
+        c = arg.completer
+        if type(c) is CompleterNone:
+            return (n, 'n')
+        if type(c) is CompleterPath and not getattr(c, 'allowednames', None):
+            return (n, 'f')
+        if type(c) is not CompleterList:
+            return (n, 'p')
+        v = tuple(str(x) for x in getattr(c, 'choices', arg.choices))
+        if v not in self.choices:
+            self.choices[v] = f'c{len(self.choices)}'
+            self.lists[self.choices[v]] = list(v)
+        return (n, self.choices[v])
+
+
+class Daemon:
+    def __init__(
+        self,
+        app: 'App',
+        argv: 'list[str]',
+        idle: 'int',
+    ) -> 'None':
+        # The path must match Script.ask.
+        root = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+        name = socket_name(app, argv[0])
+        self.path = os.path.join(root, f'argapp-{os.getuid()}', name)
+        self.idle = idle
+        self.files = [os.path.abspath(argv[0]), __file__]
+        self.stamp = self.init_stamp()
+
+    def spawn(self, parser: 'Parser') -> 'None':
+        if self.ping():
+            return
+        pid = os.fork()
+        if pid:
+            os.waitpid(pid, 0)
+            return
+        # The grandchild is detached, the shell waits for the inherited fds.
+        try:
+            os.setsid()
+            if os.fork():
+                os._exit(0)
+            null = os.open(os.devnull, os.O_RDWR)
+            for fd in [0, 1, 2, 8, 9]:
+                os.dup2(null, fd)
+            self.serve(parser)
+        finally:
+            os._exit(0)
+
+    def ping(self) -> 'bool':
+        # socket is imported here, it is a noticeable share of the startup.
+        import socket
+        if not self.owned():
+            return False
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(self.path)
+            return True
+        except OSError:
+            return False
+
+    def serve(self, parser: 'Parser') -> 'None':
+        import socket
+        os.makedirs(os.path.dirname(self.path), 0o700, exist_ok=True)
+        if not self.owned():
+            return
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(8)
+        server.settimeout(self.idle)
+        inode = os.stat(self.path).st_ino
+        finder = Finder()
+        try:
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    break
+                with conn:
+                    # A changed script is not answered, the shell falls back.
+                    if self.stamp != self.init_stamp():
+                        break
+                    conn.settimeout(self.idle)
+                    conn.sendall(self.answer(conn, finder, parser))
+        finally:
+            server.close()
+            # Another daemon may have replaced the socket after a reload.
+            if os.stat(self.path).st_ino == inode:
+                os.remove(self.path)
+
+    def answer(
+        self,
+        conn: 'socket.socket',
+        finder: 'Finder',
+        parser: 'Parser',
+    ) -> 'bytes':
+        # The request: cwd, COMP_LINE, COMP_POINT, IFS and shell, \0 after each.
+        data = b''
+        try:
+            while data.count(b'\0') < 5:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return b''
+                data += chunk
+            cwd, line, point, ifs, shell = data.decode().split('\0')[:5]
+            os.chdir(cwd)
+            os.environ.update({
+                'COMP_LINE': line,
+                'COMP_POINT': point,
+                '_ARGCOMPLETE': '1',
+                '_ARGCOMPLETE_IFS': ifs,
+                '_ARGCOMPLETE_SHELL': shell,
+                '_ARGCOMPLETE_SUPPRESS_SPACE': '1',
+            })
+            out = io.StringIO()
+            finder(
+                argument_parser=parser,
+                always_complete_options=False,
+                exit_method=lambda *args: None,
+                output_stream=out,
+            )
+            return f'+{out.getvalue()}'.encode()
+        except Exception:
+            return b''
+
+    def owned(self) -> 'bool':
+        # Another user could create the directory first and answer the requests.
+        try:
+            st = os.lstat(os.path.dirname(self.path))
+        except OSError:
+            return False
+        return (
+            stat.S_ISDIR(st.st_mode) and
+            st.st_uid == os.getuid() and
+            stat.S_IMODE(st.st_mode) == 0o700
+        )
+
+    def init_stamp(self) -> 'list[int]':
+        stamp = []
+        for x in self.files:
+            try:
+                stamp.append(os.stat(x).st_mtime_ns)
+            except OSError:
+                stamp.append(0)
+        return stamp
+
+
+class Timing:
+    def __init__(
+        self,
+        app: 'App',
+        hook: 'Callable[[dict], None] | None',
+    ) -> 'None':
+        # Without the hook, ARGAPP_TIMING is "1" for stderr or a file path.
+        self.app = app.name
+        self.hook = hook
+        self.path = os.environ.get('ARGAPP_TIMING', '')
+        if self.hook is None and self.path:
+            self.hook = self.emit
+        self.last = time.perf_counter()
+        if self.hook:
+            self.record('import', STARTED, IMPORTED)
+            self.last = time.perf_counter()
+
+    def mark(self, phase: 'str', **extra) -> 'None':
+        # The phase lasts from the previous mark, the hook time is excluded.
+        if self.hook:
+            self.record(phase, self.last, time.perf_counter(), **extra)
+            self.last = time.perf_counter()
+
+    def exit(self, e: 'BaseException') -> 'None':
+        if not self.hook:
+            return
+        extra = {'code': e.code} if isinstance(e, SystemExit) else \
+            {'error': type(e).__name__}
+        stop = time.perf_counter()
+        self.record('exit', self.last, stop, total=stop - STARTED, **extra)
+
+    def quit(self, code: 'int' = 0) -> 'None':
+        # argcomplete leaves with os._exit, the exit is recorded before.
+        self.mark('autocomplete')
+        self.exit(SystemExit(code))
+        os._exit(code)
+
+    def record(
+        self,
+        phase: 'str',
+        start: 'float',
+        stop: 'float',
+        **extra,
+    ) -> 'None':
+        self.hook({
+            'app': self.app,
+            'pid': os.getpid(),
+            'phase': phase,
+            'start': start - STARTED,
+            'seconds': stop - start,
+            **extra,
+        })
+
+    def emit(self, record: 'dict') -> 'None':
+        # json is imported only for the timing.
+        import json
+        line = json.dumps(record, default=str) + '\n'
+        if self.path == '1':
+            sys.stderr.write(line)
+            sys.stderr.flush()
+            return
+        with open(self.path, 'a') as f:
+            f.write(line)
+
+
+class Profiler:
+    # The number of lines in the allocation report.
+    top = 25
+
+    def __init__(self, app: 'App', argv: 'list[str]') -> 'None':
+        # The option is hidden, it is removed from argv before the parsing.
+        # Only "--prof" and "--prof=KIND[:FILE]" are recognized, an invalid
+        # KIND is left for the parser to report. The search stops at "--" and
+        # at the first subcommand, the option belongs to the main command only.
+        self.app = app
+        self.kind = ''
+        self.path = ''
+        self.profile = None
+        o = f'--{app.helper.prof}'
+        if o == '--':
+            return
+        # The values of the fixed count options cannot be subcommands.
+        opts = {}
+        for x in app.args:
+            if x.optional and isinstance(x.count, int):
+                opts.update((y, x.count) for y in [f'--{x.lopt}', f'-{x.sopt}'] if len(y) > 2)
+        apps = {x.name for x in app.apps}
+        skip = 0
+        for i in range(1, len(argv)):
+            if skip:
+                skip -= 1
+                continue
+            if argv[i] == '--' or argv[i] in apps:
+                break
+            skip = opts.get(argv[i], 0)
+            if argv[i] != o and not argv[i].startswith(f'{o}='):
+                continue
+            kind, _, path = argv[i][len(o) + 1:].partition(':')
+            if kind not in ['', 'cpu', 'mem']:
+                break
+            self.kind = kind or 'cpu'
+            self.path = path
+            argv.pop(i)
+            break
+
+    def start(self) -> 'None':
+        # cProfile and tracemalloc are imported only for the profiling.
+        if self.kind == 'cpu':
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif self.kind == 'mem':
+            import tracemalloc
+            tracemalloc.start()
+
+    def stop(self) -> 'None':
+        if self.kind == 'cpu':
+            self.profile.disable()
+            path = self.path or f'{self.app.name}.pstats'
+            self.profile.dump_stats(path)
+            print(f'Profile: {os.path.abspath(path)}', file=sys.stderr)
+        elif self.kind == 'mem':
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            stats = snapshot.statistics('lineno')
+            lines = [f'Top {min(self.top, len(stats))} allocations:']
+            lines.extend(str(x) for x in stats[:self.top])
+            text = '\n'.join(lines)
+            if self.path:
+                with open(self.path, 'w') as f:
+                    f.write(f'{text}\n')
+                print(f'Allocations: {os.path.abspath(self.path)}', file=sys.stderr)
+            else:
+                print(text, file=sys.stderr)
+        self.kind = ''
 
 
 def main(
     app: 'App',
     argv: 'list[str]' = None,
+    lazy: 'bool' = False,
+    cache: 'bool' = False,
+    native: 'bool' = False,
+    daemon: 'int' = 0,
+    timing: 'Callable[[dict], None] | None' = None,
+    abbrev: 'bool' = False,
 ) -> 'None':
+    global INDEXES
     argv = argv or sys.argv
     argv = [str(x) for x in argv]
     if not app.name:
         app.name = os.path.basename(argv[0])
-    # Construction.
-    parser = Parser(
-        app.name,
-        apps=[app],
-        allow_abbrev=False,
-        add_help=False,
-    )
-    # Completion.
-    autocomplete(
-        argument_parser=parser,
-        always_complete_options=False,
-    )
-    # Parsing.
+    timer = Timing(app, timing)
+    profiler = Profiler(app, argv)
+    if cache:
+        INDEXES = cache_root()
+    try:
+        profiler.start()
+        # Completion. Only the commands from COMP_LINE are constructed.
+        if '_ARGCOMPLETE' in os.environ:
+            parser = Parser(
+                app.name,
+                apps=[app],
+                lazy=True,
+                allow_abbrev=False,
+                add_help=False,
+            )
+            timer.mark('construct')
+            if daemon:
+                Daemon(app, argv, daemon).spawn(parser)
+            Finder()(
+                argument_parser=parser,
+                always_complete_options=False,
+                exit_method=timer.quit,
+            )
+        # Construction.
+        if native:
+            parser = Engine(app, lazy, abbrev)
+        else:
+            store = Cache(app, argv, abbrev) if cache else None
+            parser = store.load() if store else None
+            if parser is None:
+                parser = Parser(
+                    app.name,
+                    apps=[app],
+                    lazy=lazy,
+                    abbrev=abbrev,
+                    allow_abbrev=False,
+                    add_help=False,
+                )
+                if store:
+                    store.dump(parser)
+        timer.mark('construct')
+        # Parsing.
+        try:
+            args, apps = parser.parse(argv)
+        except CallError as e:
+            print(e.text, file=sys.stderr)
+            sys.exit(e.code)
+        timer.mark('parse')
+        # Execution.
+        e = execute(args, apps, timer)
+        if e is not None:
+            print(e.text, file=sys.stderr)
+            sys.exit(e.code)
+        sys.exit(0)
+    except BaseException as e:
+        profiler.stop()
+        timer.exit(e)
+        raise
+
+
+def completion(app: 'App', shell: 'str' = 'bash') -> 'str':
+    V = 'completion.shell'
+    raise_t(app, App, 'completion.app')
+    raise_t(shell, str, V)
+    raise_v(f'"{shell}"', shell not in ['bash', 'zsh', 'fish'], V,
+            'Must be "bash", "zsh" or "fish".')
+    if not app.name:
+        app.name = os.path.basename(sys.argv[0])
+    return Script(app, sys.argv[0]).text(shell)
+
+
+def socket_name(app: 'App', script: 'str') -> 'str':
+    # The programs with the same name, e.g. in two venvs, have different
+    # daemons: the resolved script and the interpreter are hashed. The shells
+    # cannot hash, the digest is written into the completion script.
+    import hashlib
+    name = re.sub(r'\W', '_', app.name)
+    digest = hashlib.sha1(f'{os.path.realpath(script)}\0{sys.executable}'.encode())
+    return f'{name}-{digest.hexdigest()[:16]}.sock'
+
+
+def convert(values: 'list[tuple[Arg, object]]') -> 'dict[Arg]':
+    # The values are in the argparse format. If several arguments have
+    # workers, they are converted concurrently. The results and the first
+    # error follow the order of the values either way.
+    pooled = [arg for arg, _ in values if arg.workers]
+    futures = {}
+    if len(pooled) > 1:
+        for arg in pooled:
+            pool('values', arg.workers)
+        executor = pool('args', max(arg.workers for arg in pooled))
+        for arg, v in values:
+            if arg.workers:
+                futures[arg] = executor.submit(convert_arg, arg, v)
+    args: 'dict[Arg]' = {}
+    for arg, v in values:
+        if arg in futures:
+            args[arg] = futures[arg].result()
+        else:
+            args[arg] = convert_arg(arg, v)
+    return args
+
+
+def convert_arg(arg: 'Arg', v: 'object') -> 'object':
+    if arg.append:
+        if arg.flag:
+            return arg(v or 0)
+        return arg(v or [])
+    if arg.flag:
+        return arg(bool(v))
+    return arg(v if v != [] else None)
+
+
+def convert_values(
+    T: 'Callable',
+    v: 'list',
+    workers: 'int',
+    fail: 'Callable[[int, Exception], None]',
+) -> 'list':
+    # The values are split into contiguous chunks, one task per chunk. The
+    # results are joined in order, so the first error is the same as in the
+    # calling thread. It is passed to fail with the index of the value.
+    if workers <= 0:
+        return list(map(T, v))
+    if len(v) < 2:
+        chunks = [convert_chunk(T, v)]
+    else:
+        n = -(-len(v) // (workers * 4))
+        executor = pool('values', workers)
+        futures = [executor.submit(convert_chunk, T, v[i:i + n])
+                   for i in range(0, len(v), n)]
+        chunks = (f.result() for f in futures)
+    result = []
+    for values, e in chunks:
+        result.extend(values)
+        if e is not None:
+            fail(len(result), e)
+    return result
+
+
+def convert_chunk(T: 'Callable', v: 'list') -> 'tuple[list, Exception | None]':
+    # The values before the first error and the error.
+    result = []
+    try:
+        for x in v:
+            result.append(T(x))
+    except (ValueError, TypeError) as e:
+        return (result, e)
+    return (result, None)
+
+
+def pool(kind: 'str', workers: 'int') -> 'object':
+    # The pools are created on the first use and kept for the process. The
+    # argument tasks wait for the value tasks, so they never share a pool.
+    # The pid is in the key, the threads do not survive fork.
+    k = (os.getpid(), kind, workers)
+    if k not in POOLS:
+        from concurrent.futures import ThreadPoolExecutor
+        POOLS[k] = ThreadPoolExecutor(workers, f'argapp-{kind}')
+    return POOLS[k]
+
+
+def execute(
+    args: 'dict[Arg]',
+    apps: 'list[App]',
+    timer: 'Timing | None' = None,
+) -> 'CallError | None':
+    # On the first coroutine, the rest of the chain runs on one event loop.
+    x = None
     try:
-        args, apps = parser.parse(argv)
+        for i in range(len(apps)):
+            x = apps[i]
+            v = x(args, apps)
+            if hasattr(v, '__await__'):
+                return run_async(execute_async(args, apps, timer, i, v))
+            if timer:
+                timer.mark('call', command=x.name)
     except CallError as e:
-        print(e.text, file=sys.stderr)
-        sys.exit(e.code)
-    # Execution.
+        if timer:
+            timer.mark('call', command=x.name)
+        return e
+    return None
+
+
+async def execute_async(
+    args: 'dict[Arg]',
+    apps: 'list[App]',
+    timer: 'Timing | None' = None,
+    i: 'int' = 0,
+    v: 'object' = None,
+) -> 'CallError | None':
+    # v is the result of apps[i], if it is already called.
+    x = None
     try:
-        for x in apps:
-            x(args, apps)
+        for i in range(i, len(apps)):
+            x = apps[i]
+            if v is None:
+                v = x(args, apps)
+            if hasattr(v, '__await__'):
+                await v
+            v = None
+            if timer:
+                timer.mark('call', command=x.name)
     except CallError as e:
-        print(e.text, file=sys.stderr)
-        sys.exit(e.code)
-    sys.exit(0)
+        if timer:
+            timer.mark('call', command=x.name)
+        return e
+    return None
+
+
+def run_async(coro: 'object') -> 'object':
+    # asyncio is imported only for the coroutines, asyncio.run is 3.7+.
+    import asyncio
+    if hasattr(asyncio, 'run'):
+        return asyncio.run(coro)
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def exit_error(e: 'SystemExit') -> 'CallError | None':
+    # The same codes as the interpreter uses for sys.exit.
+    if e.code is None or isinstance(e.code, int):
+        return CallError(None, e.code) if e.code else None
+    return CallError(str(e.code), 1)
+
+
+def init_batch(runner: 'Runner') -> 'None':
+    global BATCH
+    BATCH = runner
+
+
+def call_batch(
+    argv: 'list[str] | str',
+    capture: 'bool',
+) -> 'tuple[tuple[str, int] | None, str, str]':
+    # Runs in a pool process, the result is pickled. The captured output is
+    # written by the parent with the result, so the outputs do not interleave.
+    streams = (sys.stdout, sys.stderr)
+    if capture:
+        sys.stdout = io.StringIO()
+        sys.stderr = io.StringIO()
+    try:
+        e = execute(*BATCH.parse(argv))
+    except SystemExit as x:
+        e = exit_error(x)
+    finally:
+        out = sys.stdout.getvalue() if capture else ''
+        err = sys.stderr.getvalue() if capture else ''
+        sys.stdout, sys.stderr = streams
+    return (None if e is None else (e.text, e.code), out, err)
+
+
+def suggest(owners: 'list[Parser | Table]', kind: 'str', v: 'str') -> 'list[str]':
+    # The nearest subcommands or long options, the indexes are built once
+    # per Parser or Table on the first error.
+    if kind == 'opts':
+        if not v.startswith('--') or len(v) < 3:
+            return []
+        v = v.split('=', 1)[0][2:]
+    found = []
+    for owner in owners:
+        if kind not in owner.index:
+            app = owner.app
+            if kind == 'apps':
+                names = [x.name for x in app.apps]
+            else:
+                names = [x.lopt for x in app.args if x.lopt]
+                names += [x for x in [app.helper.lopt, app.helper.tree] if x]
+            owner.index[kind] = index(names)
+        found.extend(owner.index[kind].rank(v))
+    found = [x for _, _, x in sorted(found)]
+    if kind == 'opts':
+        found = [f'--{x}' for x in found]
+    return [x for x in dict.fromkeys(found)][:SUGGEST]
+
+
+def cache_root() -> 'str':
+    root = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'argapp')
+
+
+def ndarray(values: 'object') -> 'object':
+    global NUMPY
+    if NUMPY is None:
+        try:
+            import numpy
+            NUMPY = numpy
+        except ImportError:
+            NUMPY = False
+    return NUMPY.array(values) if NUMPY else values
+
+
+def index(names: 'Iterable[str]') -> 'Index':
+    # With the parser cache, a large index is stored next to it by the digest
+    # of the names. It is built once, not on the first error of each process.
+    names = [x for x in names]
+    if INDEXES is None or len(names) < 1024:
+        return Index(names)
+    import hashlib
+    import pickle
+    digest = hashlib.sha1('\0'.join(names).encode(errors='surrogateescape'))
+    path = os.path.join(INDEXES, f'index-{digest.hexdigest()[:16]}.pickle')
+    try:
+        with open(path, 'rb') as f:
+            return Index.load(pickle.load(f))
+    except Exception:
+        pass
+    result = Index(names)
+    temp = f'{path}.{os.getpid()}'
+    try:
+        os.makedirs(INDEXES, exist_ok=True)
+        with open(temp, 'wb') as f:
+            pickle.dump(result.dump(), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+    except Exception:
+        if os.path.exists(temp):
+            os.remove(temp)
+    return result
+
+
+def listed(names: 'Iterable[str]') -> 'str':
+    # The names for an invalid value, a long list is cut at LISTED.
+    names = [x for x in names]
+    text = ''.join(f'\n * {x}' for x in names[:LISTED])
+    if len(names) > LISTED:
+        text += f'\n * ... and {len(names) - LISTED} more'
+    return text
+
+
+def abbrev(owners: 'list[Parser | Table]', kind: 'str', v: 'str') -> 'list[str]':
+    # The subcommands or long options that start with v, the tries are
+    # built once per Parser or Table on the first lookup.
+    if kind == 'opts':
+        if not v.startswith('--') or len(v) < 3:
+            return []
+        v = v[2:]
+    found = []
+    for owner in owners:
+        k = f'{kind} trie'
+        if k not in owner.index:
+            app = owner.app
+            if kind == 'apps':
+                names = [x.name for x in app.apps]
+            else:
+                names = [x.lopt for x in app.args if x.lopt]
+                names += [x for x in [app.helper.lopt, app.helper.tree] if x]
+            owner.index[k] = Trie(names)
+        found.extend(owner.index[k].match(v))
+    if kind == 'opts':
+        found = [f'--{x}' for x in found]
+    return found
+
+
+def unknown(owners: 'list[Parser | Table]', extras: 'list[str]') -> 'Failure':
+    # An ambiguous prefix is reported instead of the unknown arguments.
+    # owners[0].abbrev is the same for the whole chain.
+    if owners[0].abbrev:
+        items, hints = [], []
+        for x in extras:
+            for owner in owners:
+                names = abbrev([owner], 'opts', x.split('=', 1)[0])
+                if len(names) > 1:
+                    items.append(x)
+                    hints.append(names)
+                    break
+        if items:
+            return Failure('ambiguous', items, hints=hints)
+    return Failure('unknown', extras, hints=[suggest(owners, 'opts', x) for x in extras])
+
+
+def hint(values: 'list[str]', hints: 'list[list[str]]') -> 'str':
+    if not any(hints):
+        return ''
+    if len(values) == 1:
+        return ' Did you mean:' + ''.join(f'\n * {x}' for x in hints[0])
+    return ' Did you mean:' + ''.join(
+        f'\n * {x}: {", ".join(h)}' for x, h in zip(values, hints) if h)
+
+
+def trigrams(v: 'str') -> 'set[str]':
+    v = f'\0\0{v}\0\0'
+    return {v[i:i + 3] for i in range(len(v) - 2)}
+
+
+def distance(a: 'str', b: 'str', limit: 'int') -> 'int':
+    # Levenshtein with adjacent transpositions. Anything above the limit is
+    # limit + 1, so only a band of each row is computed and the rows stop as
+    # soon as the band is above the limit.
+    big = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return big
+    # The common prefix and suffix do not change the distance, a typo leaves
+    # only a few characters for the rows.
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    j = 0
+    while j < n - i and a[-1 - j] == b[-1 - j]:
+        j += 1
+    a = a[i:len(a) - j]
+    b = b[i:len(b) - j]
+    prev2: 'list[int]' = []
+    prev = [j if j <= limit else big for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        row = [big] * (len(b) + 1)
+        if i <= limit:
+            row[0] = i
+        lo = max(1, i - limit)
+        hi = min(len(b), i + limit)
+        x = a[i - 1]
+        y = a[i - 2] if i > 1 else ''
+        for j in range(lo, hi + 1):
+            d = prev[j - 1] + (x != b[j - 1])
+            if prev[j] < d:
+                d = prev[j] + 1
+            if row[j - 1] < d:
+                d = row[j - 1] + 1
+            if j > 1 and x == b[j - 2] and y == b[j - 1] and prev2[j - 2] < d:
+                d = prev2[j - 2] + 1
+            row[j] = d if d < big else big
+        if min(row[lo - 1:hi + 1]) > limit:
+            return big
+        prev2 = prev
+        prev = row
+    return prev[-1]
+
+
+def key(apps: 'list[App]') -> 'str':
+    # The root name is excluded, it may come from argv[0].
+    return ''.join(f'/{x.name}' for x in apps[1:])
+
+
+def stream(chunks: 'Iterable[str]') -> 'None':
+    # Like print, but the text is written as it is generated. A closed pipe,
+    # like "| head", stops the output. stdout is replaced with /dev/null, so
+    # the interpreter does not fail on the final flush.
+    try:
+        for x in chunks:
+            sys.stdout.write(x)
+        sys.stdout.write('\n')
+        sys.stdout.flush()
+    except BrokenPipeError:
+        null = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(null, sys.stdout.fileno())
+        os.close(null)
+
+
+def validate_apps(cmd: 'App') -> 'None':
+    topic = 'main'
+    # The first two indices of each name. The reported error is the same as
+    # of the pairwise comparison: the lowest index with an error.
+    index: 'dict[str, list[int]]' = {}
+    for i in range(len(cmd.apps)):
+        v = index.setdefault(cmd.apps[i].name, [])
+        if len(v) < 2:
+            v.append(i)
+    errors = [(v[0], 1, v[-1]) for v in index.values() if len(v) == 2]
+    if '' in index:
+        errors.append((index[''][0], 0, 0))
+    if not errors:
+        return
+    i, kind, j = min(errors)
+    raise_v(
+        value=cmd.name,
+        error=(kind == 0),
+        topic=topic,
+        extra=f'apps[{i}].name is empty.',
+    )
+    raise_v(
+        value=cmd.name,
+        error=True,
+        topic=topic,
+        extra=f'apps[{i}] and apps[{j}] have the same name: "{cmd.apps[i].name}".',
+    )
+
+
+def validate_args(cmd: 'App') -> 'None':
+    topic = 'main'
+    args = cmd.args
+    helper = cmd.helper
+    raise_v(
+        value=cmd.name,
+        error=(helper.tree == helper.lopt and helper.tree),
+        topic=topic,
+        extra=f'help and tree help have the same lopt: "{helper.tree}".',
+    )
+    raise_v(
+        value=cmd.name,
+        error=(helper.prof in [helper.lopt, helper.tree] and helper.prof),
+        topic=topic,
+        extra=f'help and profiling have the same lopt: "{helper.prof}".',
+    )
+    # The next index with the same name, lopt and sopt, from a reverse pass.
+    # The checks are then in the order of the pairwise comparison.
+    nexts: 'list[tuple]' = [None] * len(args)
+    names: 'dict[str, int]' = {}
+    lopts: 'dict[str, int]' = {}
+    sopts: 'dict[str, int]' = {}
+    for i in range(len(args) - 1, -1, -1):
+        arg = args[i]
+        nexts[i] = (
+            names.get(arg.name),
+            lopts.get(arg.lopt) if arg.lopt else None,
+            sopts.get(arg.sopt) if arg.sopt else None,
+        )
+        names[arg.name] = i
+        if arg.lopt:
+            lopts[arg.lopt] = i
+        if arg.sopt:
+            sopts[arg.sopt] = i
+    for i in range(len(args)):
+        arg = args[i]
+        raise_v(
+            value=cmd.name,
+            error=bool(not arg.name),
+            topic=topic,
+            extra=f'args[{i}].name is empty.',
+        )
+        raise_v(
+            value=cmd.name,
+            error=(arg.lopt == helper.lopt and arg.lopt),
+            topic=topic,
+            extra=f'args[{i}] and help have the same lopt: "{arg.lopt}".',
+        )
+        raise_v(
+            value=cmd.name,
+            error=(arg.sopt == helper.sopt and arg.sopt),
+            topic=topic,
+            extra=f'args[{i}] and help have the same sopt: "{arg.sopt}".',
+        )
+        raise_v(
+            value=cmd.name,
+            error=(arg.lopt == helper.tree and arg.lopt),
+            topic=topic,
+            extra=f'args[{i}] and tree help have the same lopt: "{arg.lopt}".',
+        )
+        raise_v(
+            value=cmd.name,
+            error=(arg.lopt == helper.prof and arg.lopt),
+            topic=topic,
+            extra=f'args[{i}] and profiling have the same lopt: "{arg.lopt}".',
+        )
+        name, lopt, sopt = nexts[i]
+        if arg.positional:
+            raise_v(
+                value=cmd.name,
+                error=(name is not None),
+                topic=topic,
+                extra=f'args[{i}] and args[{name}] have the same name: "{arg.name}".',
+            )
+            continue
+        # On the same index, lopt is reported first.
+        if lopt is not None and (sopt is None or lopt <= sopt):
+            raise_v(
+                value=cmd.name,
+                error=True,
+                topic=topic,
+                extra=f'args[{i}] and args[{lopt}] have the same lopt: "{arg.lopt}".',
+            )
+        raise_v(
+            value=cmd.name,
+            error=(sopt is not None),
+            topic=topic,
+            extra=f'args[{i}] and args[{sopt}] have the same sopt: "{arg.sopt}".',
+        )
 
 
 def raise_t(
@@ -1120,3 +3883,7 @@ def raise_v(
     if not error:
         return
     raise ValueError(f'{topic}: Invalid value: {value}. {extra}')
+
+
+# The end of the import, reported by Timing.
+IMPORTED = time.perf_counter()
@@ -2,11 +2,16 @@
 Wrapper for argparse and argcomplete.
 
 Compatible with Python versions 3.6 - 3.11.
+
+argcomplete is imported only if `_ARGCOMPLETE` is set, i.e. for the completion.
+Otherwise, `Completer` and its subclasses are lightweight placeholders.
 '''
 
+import os
 import sys
 
-from typing import overload
+from collections.abc import Callable, Iterable
+from typing import Iterator, overload
 
 
 __all__ = [
@@ -19,11 +24,15 @@ __all__ = [
     'CompleterList',
     'CompleterPath',
     'CallError',
+    'Runner',
     'main',
+    'completion',
 ]
 
 
 try:
+    if '_ARGCOMPLETE' not in os.environ:
+        raise ImportError('argcomplete is not requested.')
     from argcomplete.completers import BaseCompleter as Completer
     from argcomplete.completers import SuppressCompleter as CompleterNone
     from argcomplete.completers import ChoicesCompleter as CompleterList
@@ -31,7 +40,7 @@ try:
 except:
     class Completer:
         '''
-        A dummy when argcomplete is not installed.
+        A placeholder when argcomplete is not installed or not requested.
         '''
 
         def __init__(self) -> 'None':
@@ -42,7 +51,7 @@ except:
 
     class CompleterNone(Completer):
         '''
-        A dummy when argcomplete is not installed.
+        A placeholder when argcomplete is not installed or not requested.
         '''
 
         def __init__(self) -> 'None':
@@ -53,7 +62,7 @@ except:
 
     class CompleterList(Completer):
         '''
-        A dummy when argcomplete is not installed.
+        A placeholder when argcomplete is not installed or not requested.
         '''
 
         def __init__(self, v: 'list[str]') -> 'None':
@@ -64,7 +73,7 @@ except:
 
     class CompleterPath(Completer):
         '''
-        A dummy when argcomplete is not installed.
+        A placeholder when argcomplete is not installed or not requested.
         '''
 
         def __init__(self) -> 'None':
@@ -77,6 +86,9 @@ except:
 class Arg:
     '''
     Represents a command line argument.
+    The fields are in `__slots__`, a subclass is required for extra attributes.
+    The converter used by `__call__` is specialized for the fields once,
+    and rebuilt after any field is set.
     '''
 
     @property
@@ -152,7 +164,7 @@ class Arg:
         The argument's help text generator.
 
         Defaults:
-        * `ArgHelper()`.
+        * `ArgHelper()`, allocated on the first access.
 
         Exceptions:
         * `TypeError`, if the type is not `ArgHelper` or `None`.
@@ -330,17 +342,94 @@ class Arg:
 
         Defaults:
         * `CompleterList(self.choices)`, if `self.choices` is not empty.
-        * `CompleterPath()`, if `self.type` is `str`.
-        * `CompleterNone()`.
+        * `CompleterPath()`, if `self.type` is `str`. The instance is shared by all `Arg`.
+        * `CompleterNone()`. The instance is shared by all `Arg`.
 
         Exceptions:
-        * `TypeError`, if the type is not `Completer` or `None`.
+        * `TypeError`, if the type is not `Completer`, `argcomplete.completers.BaseCompleter` or `None`.
         '''
 
     @completer.setter
     def completer(self, v: 'Completer | None') -> 'None':
         ...
 
+    @property
+    def stream(self) -> 'bool':
+        '''
+        Whether the values are delivered as a lazily converted iterator.
+        Only for `self.count` `'*'`, `'+'` or `'~'`. In this mode:
+        * `@FILE` is replaced by the lines of `FILE`. The file is mapped to memory.
+        * `-` is replaced by the lines of stdin.
+        * The empty lines are skipped.
+        * The files are opened by `self.__call__`, but read on iteration.
+          They are closed when the iterator is exhausted, closed or garbage collected.
+        * `self.default` is delivered as an `Iterator` over it, or `None`.
+        * The values are checked and converted on iteration.
+
+        Defaults:
+        * `False`.
+
+        Exceptions:
+        * `TypeError`, if the type is not `bool` or `None`.
+        '''
+
+    @stream.setter
+    def stream(self, v: 'bool | None') -> 'None':
+        ...
+
+    @property
+    def array(self) -> 'bool':
+        '''
+        Whether the values are converted in bulk to a typed array.
+        Only for `self.type` `int` or `float` and `self.multiple` `True`. In this mode:
+        * The values are converted in one pass to `array.array('q')` or `array.array('d')`.
+        * The array is returned as `numpy.ndarray`, if NumPy can be imported. It is looked up once.
+        * `self.default` is converted to an array too, unless it is `None`.
+        * An invalid value is reported by `CallError` with its index.
+        * If `self.stream` is `True`, the argument files are read whole.
+
+        Defaults:
+        * `False`.
+
+        Exceptions:
+        * `TypeError`, if the type is not `bool` or `None`.
+        '''
+
+    @array.setter
+    def array(self, v: 'bool | None') -> 'None':
+        ...
+
+    @property
+    def workers(self) -> 'int':
+        '''
+        The number of threads that apply `self.type`, for a costly `self.type`.
+        Only for `self.append` or `self.multiple` `True`. If set:
+        * The values are converted in chunks on a thread pool of this size.
+        * Several such arguments of a command line are converted concurrently.
+        * The results and the first error keep the order of the values.
+        * `ValueError` and `TypeError` of `self.type` are raised as `CallError`
+          with the index of the value, like for `self.array`.
+        * The pools are created on the first use and kept for the process.
+
+        Defaults:
+        * `0`, the values are converted in the calling thread.
+
+        Exceptions:
+        * `TypeError`, if the type is not `int` or `None`.
+        * `ValueError`, if the value is negative.
+        '''
+
+    @workers.setter
+    def workers(self, v: 'int | None') -> 'None':
+        ...
+
+    @property
+    def revision(self) -> 'int':
+        '''
+        The number of changes, each setter increments it. Read-only.
+        The compiled conversion, the help text and the suggestion index of the argument are rebuilt after a change.
+        '''
+
     @property
     def optional(self) -> 'bool':
         '''
@@ -407,6 +496,9 @@ class Arg:
         required: 'bool | None' = None,
         append: 'bool | None' = None,
         completer: 'Completer | None' = None,
+        stream: 'bool | None' = None,
+        array: 'bool | None' = None,
+        workers: 'int | None' = None,
     ) -> 'None':
         '''
         The constructor. Sets each field in the declaration order.
@@ -426,6 +518,9 @@ class Arg:
         * `required` - corresponds to `self.required`.
         * `append` - corresponds to `self.append`.
         * `completer` - corresponds to `self.completer`.
+        * `stream` - corresponds to `self.stream`.
+        * `array` - corresponds to `self.array`.
+        * `workers` - corresponds to `self.workers`.
         '''
 
     @overload
@@ -504,6 +599,8 @@ class Arg:
 
         Exceptions:
         * `CallError`, if `self.restrict` is `True` and any item is not in `self.choices`.
+          All such items are reported.
+        * `CallError`, if `self.workers` is set and any item cannot be converted.
         '''
 
     @overload
@@ -520,11 +617,18 @@ class Arg:
         * `v` - a list of values from the command line.
 
         Returns:
-        * `self.default`, if `v` is `None`.
+        * `self.default`, if `v` is `None`. An `Iterator` over it, if `self.stream` is `True` and it is not `None`.
+        * A typed array of the values from `v`, if `self.array` is `True`.
+        * An `Iterator` over the values from `v`, if `self.stream` is `True`.
         * A `list` where each item `x` from `v` is set to `self.type(x)`.
 
         Exceptions:
         * `CallError`, if `self.restrict` is `True` and any item is not in `self.choices`.
+          All such items are reported.
+          If `self.stream` is `True`, it is raised on iteration.
+        * `CallError`, if `self.stream` is `True` and a file cannot be opened.
+        * `CallError`, if `self.array` is `True` and any item cannot be converted.
+        * `CallError`, if `self.workers` is set and any item cannot be converted.
         '''
 
     @overload
@@ -542,17 +646,25 @@ class Arg:
 
         Returns:
         * A `list[list]` where each list `l` from `v` is converted to:
-           * `self.default`, if `l` is `None`.
+           * `self.default`, if `l` is `None`. An `Iterator` over it, if `self.stream` is `True` and it is not `None`.
+           * A typed array of the values from `l`, if `self.array` is `True`.
+           * An `Iterator` over the values from `l`, if `self.stream` is `True`.
            * A `list` where each item `x` from `l` is converted to `self.type(x)`.
 
         Exceptions:
         * `CallError`, if `self.restrict` is `True` and any item is not in `self.choices`.
+          All such items are reported.
+          If `self.stream` is `True`, it is raised on iteration.
+        * `CallError`, if `self.stream` is `True` and a file cannot be opened.
+        * `CallError`, if `self.array` is `True` and any item cannot be converted.
+        * `CallError`, if `self.workers` is set and any item cannot be converted.
         '''
 
 
 class App:
     '''
     Represents a command.
+    The fields are in `__slots__`, a subclass is required for extra attributes.
     '''
 
     @property
@@ -625,7 +737,7 @@ class App:
         The command's help text generator.
 
         Defaults:
-        * `AppHelper()`.
+        * `AppHelper()`, allocated on the first access.
 
         Exceptions:
         * `TypeError`, if the type is not `AppHelper` or `None`.
@@ -653,6 +765,13 @@ class App:
         * `[]`.
         '''
 
+    @property
+    def revision(self) -> 'int':
+        '''
+        The number of changes, each setter increments it. Read-only.
+        The help text of the command is rebuilt after a change, or after a change of `self.args` or `self.apps`.
+        '''
+
     def __init__(
         self,
         name: 'str | None' = None,
@@ -682,6 +801,9 @@ class App:
         * This function is called by `main()` on each command from the command line.
         * The base implementation does nothing, the subclasses are supposed to override it.
         * `CallError` has to be raised to notify about any errors.
+        * It may be a coroutine function (`async def`). On the first coroutine, the rest of the chain
+          runs on one event loop, so the parent commands can start tasks that the child commands await.
+          `asyncio.run()` is used by `main()` and `Runner.run()`, `Runner.run_async()` uses the running loop.
 
         Parameters:
         * `args` - A dictionary of `Arg` and its parsed command line value.
@@ -692,6 +814,10 @@ class App:
 class ArgHelper:
     '''
     An argument description generator.
+
+    The generated text is cached per `Arg` until a field of this `ArgHelper`
+    or of the `Arg` is set, see their `revision`. In-place changes of the
+    containers, such as `Arg.choices` or a `list` in `Arg.default`, are not tracked.
     '''
 
     @property
@@ -726,6 +852,13 @@ class ArgHelper:
     def default(self, v: 'bool | None') -> 'None':
         ...
 
+    @property
+    def revision(self) -> 'int':
+        '''
+        The number of changes, each setter increments it. Read-only.
+        The generated text is memoized per `Arg` until this or the `Arg` changes.
+        '''
+
     def text_help(self, arg: 'Arg') -> 'str':
         '''
         Generate the argument's description.
@@ -775,6 +908,11 @@ class ArgHelper:
 class AppHelper:
     '''
     A command description generator.
+
+    The generated text is cached per `apps` and `name` until a field of this
+    `AppHelper`, of a command in `apps`, of a subcommand of the last command,
+    or of an argument of the last command or its `ArgHelper` is set, see their
+    `revision`, or the last command's `App.args` or `App.apps` change.
     '''
 
     @property
@@ -825,6 +963,56 @@ class AppHelper:
     def help(self, v: 'str | None') -> 'None':
         ...
 
+    @property
+    def tree(self) -> 'str':
+        '''
+        The long option name for the tree help argument. Similar to `Arg.lopt`.
+        The argument prints the help text for the command and all its
+        subcommands, see `self.iter_tree`.
+
+        Defaults:
+        * `''`, the argument is not added.
+
+        Exceptions:
+        * `TypeError`, if the type is not `str` or `None`.
+        '''
+
+    @tree.setter
+    def tree(self, v: 'str | None') -> 'None':
+        ...
+
+    @property
+    def prof(self) -> 'str':
+        '''
+        The long option name for the hidden profiling argument. Similar to `Arg.lopt`.
+        Applies only to the `app` of `main()`, it is not shown in the help and not completed.
+
+        The argument is removed from the command line before the parsing, only in the option position
+        of the main command: before `--` and before the first subcommand.
+        The whole `main()` runs under the profiler, with the following values:
+        * `--prof` or `--prof=cpu[:FILE]` - cProfile, the pstats are written to `FILE`, `<app.name>.pstats` by default.
+        * `--prof=mem[:FILE]` - tracemalloc, the top 25 allocations by line are written to `FILE`, stderr by default.
+
+        Any other value is left in the command line, i.e. it is reported as an unknown argument.
+
+        Defaults:
+        * `''`, the argument is not recognized.
+
+        Exceptions:
+        * `TypeError`, if the type is not `str` or `None`.
+        '''
+
+    @prof.setter
+    def prof(self, v: 'str | None') -> 'None':
+        ...
+
+    @property
+    def revision(self) -> 'int':
+        '''
+        The number of changes, each setter increments it. Read-only.
+        The generated text is memoized per command chain until this, the commands or their arguments change.
+        '''
+
     def text_help(
         self,
         apps: 'list[App]',
@@ -843,10 +1031,46 @@ class AppHelper:
            * `apps[-1].prolog`.
            * `self.section_apps("Commands", apps[-1].apps)`.
            * `self.section_args("Positional arguments", args)`, where `args` - positional arguments from `apps[-1].args`.
-           * `self.section_args("Optional arguments", args)`, where `args` - optional arguments from `apps[-1].args` and the help option, if set.
+           * `self.section_args("Optional arguments", args)`, where `args` - optional arguments from `apps[-1].args`, the help and the tree help options, if set.
            * `apps[-1].epilog`.
         '''
 
+    def iter_help(
+        self,
+        apps: 'list[App]',
+        name: 'str',
+    ) -> 'Iterator[str]':
+        '''
+        Generate the command's full help text section by section.
+        The help arguments write the sections as they are generated, a closed
+        stdout (like `| head`) stops the output.
+
+        Parameters:
+        * `apps` - a list of commands mentioned in the command line. The text is generated for the last one.
+        * `name` - a name to use for the first command in `apps`.
+
+        Returns:
+        * An iterator over the sections of `self.text_help(apps, name)`, each one ends with a new line.
+        * `self.text_help(apps, name)` as a whole, if it is overridden.
+        '''
+
+    def iter_tree(
+        self,
+        apps: 'list[App]',
+        name: 'str',
+    ) -> 'Iterator[str]':
+        '''
+        Generate the full help text for the command and all its subcommands.
+        The tree is traversed once, depth-first.
+
+        Parameters:
+        * `apps` - a list of commands mentioned in the command line. The text is generated for the last one and its subcommands.
+        * `name` - a name to use for the first command in `apps`.
+
+        Returns:
+        * An iterator over `self.iter_help(apps, name)`, followed by `app.helper.iter_tree(apps + [app], name)` for each `app` in `apps[-1].apps`. The commands are separated by a blank line.
+        '''
+
     def text_usage(
         self,
         apps: 'list[App]',
@@ -905,6 +1129,8 @@ class AppHelper:
         lopt: 'str | None' = 'help',
         sopt: 'str | None' = 'h',
         help: 'str | None' = 'Show the help text and exit.',
+        tree: 'str | None' = None,
+        prof: 'str | None' = None,
     ) -> 'None':
         '''
         The constructor. Sets each field in the declaration order.
@@ -913,6 +1139,8 @@ class AppHelper:
         * `lopt` - corresponds to `self.lopt`.
         * `sopt` - corresponds to `self.sopt`.
         * `help` - corresponds to `self.help`.
+        * `tree` - corresponds to `self.tree`.
+        * `prof` - corresponds to `self.prof`.
         '''
 
 
@@ -968,22 +1196,198 @@ class CallError:
         '''
 
 
+class Runner:
+    '''
+    An in-process runtime of the command, for running many command lines in one process.
+    The `app` is translated once, `self.run()` does the parsing and execution like `main()`,
+    but returns the exit code instead of calling `sys.exit()`.
+
+    The capture replaces `sys.stdout` and `sys.stderr` for the duration of `self.run()`,
+    so the runs with the capture must not overlap in different threads.
+    '''
+
+    @property
+    def app(self) -> 'App':
+        '''
+        The command to run. Read-only.
+        '''
+
+    @property
+    def out(self) -> 'str':
+        '''
+        The captured stdout of the last `self.run()`. Read-only.
+
+        Defaults:
+        * `''`, also if the capture is disabled.
+        '''
+
+    @property
+    def err(self) -> 'str':
+        '''
+        The captured stderr of the last `self.run()`, including the `CallError` texts. Read-only.
+
+        Defaults:
+        * `''`, also if the capture is disabled.
+        '''
+
+    def __init__(
+        self,
+        app: 'App',
+        lazy: 'bool' = False,
+        native: 'bool' = False,
+        capture: 'bool' = True,
+        abbrev: 'bool' = False,
+    ) -> 'None':
+        '''
+        The constructor. Translates `app`, with the same checks as `main()`.
+        `app.name` is set to `os.path.basename(sys.argv[0])` if empty.
+
+        Parameters:
+        * `app`     - corresponds to `self.app`.
+        * `lazy`    - the same as for `main()`.
+        * `native`  - the same as for `main()`.
+        * `capture` - whether to capture stdout and stderr into `self.out` and `self.err`.
+        * `abbrev`  - the same as for `main()`.
+
+        Exceptions:
+        * `TypeError`, if the type of any parameter is invalid.
+        * `ValueError`, on the same construction checks as `main()`.
+        '''
+
+    def parse(self, argv: 'list[str] | str') -> 'tuple[dict[Arg], list[App]]':
+        '''
+        Parse a command line without the execution.
+
+        Parameters:
+        * `argv` - the command line including the command name. A `str` is split by `shlex.split()`.
+
+        Returns:
+        * `args` and `apps` for `App.__call__()`.
+
+        Exceptions:
+        * `TypeError`, if the type of `argv` is not `list` or `str`.
+        * `CallError`, on a parsing error. The text includes the usage.
+        * `SystemExit`, if the help argument is mentioned, after the help is printed.
+        '''
+
+    def batch(
+        self,
+        argvs: 'Iterable[list[str] | str]',
+        call: 'bool' = False,
+        workers: 'int' = 0,
+        ordered: 'bool' = True,
+    ) -> 'Iterator[tuple[int, tuple[dict[Arg], list[App]] | CallError]]':
+        '''
+        Parse and optionally execute many command lines, e.g. a command log.
+        `argvs` is read and parsed gradually as the results are consumed.
+        The output of the help and `App.__call__()` is not captured.
+
+        Parameters:
+        * `argvs`   - the command lines, the same as for `self.run()`.
+        * `call`    - whether to execute the parsed command lines, like `self.run()`.
+        * `workers` - the number of processes to execute the command lines, if `call` is `True`.
+          `0` means executing in this process. The processes are forked with this `Runner`,
+          they parse the command line again and call `App.__call__()` of their copy of the tree.
+          Up to 16 command lines per process are pending. With the capture, the output of each command line
+          is collected in its process and written to `sys.stdout` and `sys.stderr` of this process
+          when its result is delivered, so the outputs of the processes do not interleave.
+        * `ordered` - whether to deliver the results in the order of `argvs`, if the processes are used.
+          Otherwise, the results are delivered as they are ready.
+
+        Returns:
+        * An iterator over `(i, result)`, where `i` is the index in `argvs` and `result` is:
+           * `(args, apps)` from `self.parse()`, if the parsing and the execution succeeded.
+           * `CallError` from the parsing, or from the execution if `call` is `True`.
+             An exit with a non-zero code is reported with that code and the empty text,
+             as is the help argument with the code `0`.
+
+        Exceptions:
+        * `TypeError`, if the type of any parameter is invalid.
+        * `ValueError`, if `workers` is negative.
+        * Other exceptions from `App.__call__()` are raised during the iteration.
+        '''
+
+    async def run_async(self, argv: 'list[str] | str') -> 'int':
+        '''
+        The same as `self.run()`, but the chain is awaited on the running event loop.
+        With the capture, the output of the other tasks during the run is captured too.
+        '''
+
+    def run(self, argv: 'list[str] | str') -> 'int':
+        '''
+        Parse and execute a command line, like `main()`.
+        A coroutine from `App.__call__()` starts a new event loop, use `self.run_async()` in a running one.
+
+        Parameters:
+        * `argv` - the command line including the command name. A `str` is split by `shlex.split()`.
+
+        Returns:
+        * `0` on success, including the help.
+        * `CallError.code` on a parsing error or a `CallError` from `App.__call__()`.
+          The text is printed to stderr, i.e. `self.err` with the capture.
+        * The code of `SystemExit` raised by `App.__call__()`, `1` if it is not an `int` or `None`.
+
+        Exceptions:
+        * `TypeError`, if the type of `argv` is not `list` or `str`.
+        * Other exceptions from `App.__call__()` are not intercepted.
+        '''
+
+
 def main(
     app: 'App',
     argv: 'list[str]' = sys.argv,
+    lazy: 'bool' = False,
+    cache: 'bool' = False,
+    native: 'bool' = False,
+    daemon: 'int' = 0,
+    timing: 'Callable[[dict], None] | None' = None,
+    abbrev: 'bool' = False,
 ) -> 'None':
     '''
     A complete runtime of the command. It does the following:
     * Construction. `app` is translated to `argparse.ArgumentParser` and sanity checks are performed.
       `app.name` is set to `os.path.basename(argv[0])` if empty.
+    * Completion. Done only if argcomplete requests it via `_ARGCOMPLETE`, before the construction.
+      Only the commands mentioned in `COMP_LINE` are translated, regardless of `lazy`, `cache` and `native`.
     * Parsing. `argv` is translated to `args` and `apps` for `App.__call__()`.
-    * Execution. `sys.exit()` is always called, so there is no return. The flow depends on the presence of the help option:
-       * If mentioned, only the text is printed to stdout.
+    * Execution. `sys.exit()` is always called, so there is no return. The flow depends on the presence of the help options:
+       * If mentioned, only the text is printed to stdout. A closed stdout stops the output with code `0`.
        * If not mentioned, `x(args, apps)` is called for each `x` in `apps`.
 
     Parameters:
     * `app`  - an `App` to translate to `argparse.ArgumentParser`.
     * `argv` - the command line including the command name, defaults to `sys.argv`.
+    * `lazy` - whether to construct only the subcommands mentioned in `argv`.
+      The rest are constructed on demand, e.g. for the completion.
+      The construction exceptions for the subcommands are raised during parsing.
+    * `cache` - whether to store the constructed parser in a file and load it instead of the construction.
+      The file is `$XDG_CACHE_HOME/argapp/<app.name>-<hash of argv[0]>.pickle` (`~/.cache` if not set).
+      It is rebuilt if the fingerprint of `app` changes: names, options, counts and flags of all `App` and `Arg`.
+      The cache is ignored if the file cannot be read or written.
+      The suggestion indexes of 1024 and more names are stored in the same directory on the first error,
+      as `index-<hash of the names>.pickle`, also with `native`.
+    * `native` - whether to parse `argv` without argparse, using lookup tables built from `App.args` and `App.apps`.
+      The result and the `CallError` texts are the same as with argparse.
+      argparse is still used for the completion, `cache` applies only to it.
+    * `daemon` - the idle timeout in seconds of the completion daemon, `0` disables it.
+      On completion, a detached process is started that keeps the constructed parser and
+      answers the scripts from `completion()` over the Unix socket `$XDG_RUNTIME_DIR/argapp-<uid>/<app.name>-<hash>.sock`
+      (`/tmp` if not set). The hash is of the resolved `argv[0]` and `sys.executable`, so the programs
+      with the same name have different daemons. The scripts use `socat` or `nc -U`, and run the command
+      if the daemon does not answer.
+      The daemon is not used unless the directory is owned by the user and has mode `0700`.
+      The daemon exits after `daemon` seconds without requests, or on a request after `argv[0]` or argapp is modified.
+    * `timing` - a hook that receives the duration of each phase as a `dict`.
+      If `None`, the environment variable `ARGAPP_TIMING` enables JSON lines with the same records:
+      to stderr if it is `1`, otherwise appended to the file it names.
+      The keys are `app`, `pid`, `phase`, `start` (since the import start) and `seconds`.
+      The phases are `import`, `construct`, `autocomplete`, `parse`, `call` (with `command`, for each `App.__call__()`)
+      and `exit` (with `total`, and `code` or `error` - the exception type name).
+    * `abbrev` - whether to accept unambiguous prefixes of the long options and the subcommand names,
+      e.g. `--verb` for `--verbose` and `inst` for `install`. The exact names take precedence.
+      An ambiguous prefix is a `CallError` that lists the candidates.
+      The prefixes are looked up in a trie per command, built on the first lookup.
+      The completion does not use the prefixes.
 
     Exceptions:
     * Construction. All exceptions are not intercepted.
@@ -992,6 +1396,8 @@ def main(
        * `ValueError`, if any positional `Arg` has empty `Arg.name`.
        * `ValueError`, if any positional `Arg` have the same `Arg.name`.
        * `ValueError`, if any optional `Arg` or `App.helper` have the same `lopt` or `sopt`.
+       * `ValueError`, if any optional `Arg` or `App.helper.lopt` have the same `lopt` as `App.helper.tree`.
+       * `ValueError`, if any optional `Arg`, `App.helper.lopt` or `App.helper.tree` have the same `lopt` as `App.helper.prof`.
     * Parsing. `CallError` is intercepted and printed with the usage to stderr, followed by `sys.exit()`. Other exceptions are not intercepted.
        * `SystemExit`, on a custom `CallError` from `App.__call__()`, code `CallError.code`.
        * `SystemExit`, on a missing subcommand, code `1`.
@@ -1006,6 +1412,38 @@ def main(
     '''
 
 
+def completion(
+    app: 'App',
+    shell: 'str' = 'bash',
+) -> 'str':
+    '''
+    Generate a self-contained completion script for `app`, to be sourced by the shell.
+    The completion does not start Python, except for `Arg` with a custom `Completer`:
+    * Subcommands - `App.name` of `App.apps`.
+    * Optional arguments - `Arg.lopt` and `Arg.sopt`, including `App.helper`.
+    * Values from `CompleterList`, i.e. `Arg.choices` by default.
+    * Paths for `CompleterPath`, nothing for `CompleterNone`.
+    * Other `Completer` - the command is called as for argcomplete, which must be installed.
+      The completion daemon is asked first, if started by `main()` with `daemon`.
+      Its socket is named after `sys.argv[0]` and `sys.executable`, i.e. the script must be generated
+      by the same program and interpreter that call `main()`.
+
+    The words are split by whitespace, quotes in the command line are not interpreted by bash.
+    zsh requires `compinit` before the script is sourced.
+    `app.name` is set to `os.path.basename(sys.argv[0])` if empty, it is the completed command.
+
+    Parameters:
+    * `app`   - an `App` to generate the script for.
+    * `shell` - the target shell, `"bash"`, `"zsh"` or `"fish"`.
+
+    Exceptions:
+    * `TypeError`, if the type of `app` is not `App`.
+    * `TypeError`, if the type of `shell` is not `str`.
+    * `ValueError`, if `shell` is not `"bash"`, `"zsh"` or `"fish"`.
+    * `ValueError`, on the same construction checks as `main()`.
+    '''
+
+
 def raise_t(
     value: 'object',
     types: 'type | tuple[type]',
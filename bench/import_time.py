@@ -0,0 +1,94 @@
+'''
+Check the import time of argapp against a budget.
+
+Each run is a fresh interpreter without `_ARGCOMPLETE`, i.e. a regular command
+startup. The standard modules that argapp imports are timed first, then argapp
+itself. The budget is the ratio of the two, so that it holds on a slower or a
+loaded machine. The bytecode is cached in a temporary directory, like for an
+installed command, the repository is not written.
+
+Usage: python3 bench/import_time.py [budget] [runs]
+Exits with code 1 if the median ratio exceeds the budget, 0.5 by default.
+ARGAPP_IMPORT_BUDGET overrides the default, "off" skips the check.
+tests/test_import_time.py checks the same budget.
+'''
+
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The import of argapp itself, relative to the standard modules it imports.
+BUDGET = 0.5
+
+# The repository is the package, its directory name may differ.
+CODE = '''
+import importlib.util, sys, time
+t = time.perf_counter()
+import argparse, collections.abc, io, os, re, shlex, stat
+u = time.perf_counter()
+s = importlib.util.spec_from_file_location(
+    'argapp', sys.argv[1], submodule_search_locations=[])
+m = importlib.util.module_from_spec(s)
+sys.modules['argapp'] = m
+s.loader.exec_module(m)
+v = time.perf_counter()
+print(u - t, v - u, 'argcomplete' in sys.modules)
+'''
+
+
+def budget() -> 'float | None':
+    # None if the check is off.
+    v = os.environ.get('ARGAPP_IMPORT_BUDGET', '')
+    if v == 'off':
+        return None
+    return float(v) if v else BUDGET
+
+
+def measure(runs: 'int', path: 'str' = ROOT) -> 'tuple[float, float, bool]':
+    # The median milliseconds of the standard modules and of argapp, and
+    # whether argcomplete was imported.
+    if os.path.isdir(path):
+        path = os.path.join(path, '__init__.py')
+    env = {k: v for k, v in os.environ.items()
+           if k not in ['_ARGCOMPLETE', 'PYTHONDONTWRITEBYTECODE']}
+    base = []
+    own = []
+    argcomplete = False
+    with tempfile.TemporaryDirectory() as temp:
+        # A copy caches its bytecode next to it, the first run writes it.
+        copy = os.path.join(temp, 'argapp', '__init__.py')
+        os.makedirs(os.path.dirname(copy))
+        shutil.copy(path, copy)
+        env['PYTHONPYCACHEPREFIX'] = temp
+        for i in range(runs + 1):
+            out = subprocess.run(
+                [sys.executable, '-c', CODE, copy],
+                env=env,
+                check=True,
+                stdout=subprocess.PIPE,
+            ).stdout.split()
+            argcomplete = argcomplete or out[2] == b'True'
+            if i:
+                base.append(float(out[0]) * 1000)
+                own.append(float(out[1]) * 1000)
+    return statistics.median(base), statistics.median(own), argcomplete
+
+
+def main() -> 'None':
+    limit = float(sys.argv[1]) if len(sys.argv) > 1 else budget()
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    base, own, argcomplete = measure(runs)
+    print(f'standard modules: {base:.2f} ms')
+    print(f'import argapp: {own:.2f} ms, {own / base:.2f} of them (budget {limit})')
+    if argcomplete:
+        print('argcomplete is imported')
+    sys.exit(int(argcomplete or (limit is not None and own > base * limit)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+'''
+Report the memory taken by a resident command tree, in bytes per Arg and App.
+
+Each argapp is measured in a fresh interpreter with tracemalloc. Pass several
+files or directories to compare, e.g. a checkout of the previous revision:
+    git show HEAD~1:__init__.py > /tmp/argapp_old.py
+    python3 bench/memory.py . /tmp/argapp_old.py
+
+Usage: python3 bench/memory.py [path...]
+'''
+
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 100 apps with 100 args each, the usual mix of optional and positional.
+CODE = '''
+import importlib.util, sys, tracemalloc
+s = importlib.util.spec_from_file_location(
+    'argapp', sys.argv[1], submodule_search_locations=[])
+m = importlib.util.module_from_spec(s)
+sys.modules['argapp'] = m
+s.loader.exec_module(m)
+APPS, ARGS = 100, 100
+kinds = [
+    lambda i: m.Arg(lopt=f'opt-{i}', help='An option.'),
+    lambda i: m.Arg(lopt=f'flag-{i}', sopt=None, count=0),
+    lambda i: m.Arg(lopt=f'num-{i}', default=1),
+    lambda i: m.Arg(lopt=f'choice-{i}', choices=['a', 'b', 'c']),
+    lambda i: m.Arg(name=f'POS{i}', count='?'),
+]
+tracemalloc.start()
+base = tracemalloc.get_traced_memory()[0]
+root = m.App('root')
+for i in range(APPS):
+    app = m.App(f'app-{i}', help='A command.')
+    app.args.extend(kinds[j % len(kinds)](j) for j in range(ARGS))
+    root.apps.append(app)
+full = tracemalloc.get_traced_memory()[0] - base
+tracemalloc.stop()
+tracemalloc.start()
+base = tracemalloc.get_traced_memory()[0]
+apps = [m.App(f'app-{i}', help='A command.') for i in range(APPS * 10)]
+app = tracemalloc.get_traced_memory()[0] - base
+print(full / (APPS * ARGS), app / (APPS * 10))
+'''
+
+
+def measure(path: 'str') -> 'tuple[float, float]':
+    if os.path.isdir(path):
+        path = os.path.join(path, '__init__.py')
+    out = subprocess.run(
+        [sys.executable, '-c', CODE, path],
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout.split()
+    return (float(out[0]), float(out[1]))
+
+
+def main() -> 'None':
+    for path in sys.argv[1:] or [ROOT]:
+        arg, app = measure(path)
+        print(f'{path}: {arg:.0f} bytes per Arg, {app:.0f} bytes per App')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+'''
+Benchmark the construction, parsing, help and completion on synthetic trees.
+
+The tree has `width` subcommands per command, `depth` levels deep. Each command
+has `args` optional arguments, each choice argument has `choices` values.
+The cold import and the completion are measured in fresh interpreters, the
+completion is skipped if argcomplete is not installed. Nothing leaves the host.
+
+Examples:
+    python3 bench/suite.py
+    python3 bench/suite.py --args 200 --choices 500
+    python3 bench/suite.py --scale args=10,100,1000
+    python3 bench/suite.py --save /tmp/base.json
+    python3 bench/suite.py --baseline /tmp/base.json --tolerance 1.3
+    python3 bench/suite.py --path /tmp/argapp_old.py
+
+Exits with code 1 if any metric exceeds the baseline times the tolerance.
+'''
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+import import_time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Measured in a fresh interpreter, argcomplete is imported only on request.
+CODE = '''
+import io, os, sys
+sys.path.insert(0, sys.argv[1])
+import suite
+w, d, a, c = [int(x) for x in sys.argv[3:7]]
+m = suite.load(sys.argv[2])
+if 'argcomplete' not in sys.modules:
+    print('nan')
+    sys.exit(0)
+root = suite.tree(m, w, d, a, c)
+line = ' '.join(suite.path(d) + ['--opt-0', ''])
+os.environ['COMP_LINE'] = line
+os.environ['COMP_POINT'] = str(len(line))
+kwds = {'lazy': True} if suite.lazy(m) else {}
+finder = getattr(m, 'Finder', None) or sys.modules['argcomplete'].CompletionFinder
+
+
+def run():
+    parser = m.Parser(
+        'root',
+        apps=[root],
+        allow_abbrev=False,
+        add_help=False,
+        **kwds,
+    )
+    finder()(
+        argument_parser=parser,
+        always_complete_options=False,
+        exit_method=lambda *args: None,
+        output_stream=io.StringIO(),
+    )
+
+
+print(suite.timed(run, int(sys.argv[7])))
+'''
+
+# The usual mix: choices, flags, numbers and lists.
+KINDS = [
+    lambda m, j, n: m.Arg(
+        lopt=f'opt-{j}',
+        help='An option.',
+        choices=[f'c{k}' for k in range(n)] or None,
+    ),
+    lambda m, j, n: m.Arg(lopt=f'flag-{j}', help='A flag.', count=0),
+    lambda m, j, n: m.Arg(lopt=f'num-{j}', help='A number.', default=0),
+    lambda m, j, n: m.Arg(lopt=f'list-{j}', help='A list.', count='*'),
+]
+VALUES = [
+    lambda j: [f'--opt-{j}', 'c0'],
+    lambda j: [f'--flag-{j}'],
+    lambda j: [f'--num-{j}', '5'],
+    lambda j: [f'--list-{j}', 'a', 'b'],
+]
+
+
+def load(path: 'str') -> 'object':
+    if os.path.isdir(path):
+        path = os.path.join(path, '__init__.py')
+    s = importlib.util.spec_from_file_location(
+        'argapp', path, submodule_search_locations=[])
+    m = importlib.util.module_from_spec(s)
+    sys.modules['argapp'] = m
+    s.loader.exec_module(m)
+    return m
+
+
+def lazy(m: 'object') -> 'bool':
+    # Parser passes unknown keywords to argparse, older revisions lack lazy.
+    try:
+        m.Parser('x', apps=[m.App('x')], lazy=True, allow_abbrev=False, add_help=False)
+    except TypeError:
+        return False
+    return True
+
+
+def tree(m: 'object', width: 'int', depth: 'int', args: 'int', choices: 'int') -> 'object':
+    def node(name: 'str', level: 'int') -> 'object':
+        app = m.App(name, help=f'The {name} command.')
+        app.args.extend(KINDS[j % len(KINDS)](m, j, choices) for j in range(args))
+        if level < depth:
+            app.apps.extend(node(f'cmd{i}', level + 1) for i in range(width))
+        else:
+            app.args.append(m.Arg(name='FILE', help='A file.', count='?'))
+        return app
+
+    return node('root', 0)
+
+
+def path(depth: 'int') -> 'list[str]':
+    return ['root'] + ['cmd0'] * depth
+
+
+def argv(depth: 'int', args: 'int', choices: 'int') -> 'list[str]':
+    result = path(depth) + ['file.txt']
+    for j in range(args):
+        result.extend(VALUES[j % len(VALUES)](j))
+        if j % len(VALUES) == 0 and not choices:
+            result[-1] = 'x'
+    return result
+
+
+def timed(fn: 'object', repeat: 'int') -> 'float':
+    # Like timeit: the loop is calibrated to 20 ms, the best repeat is taken.
+    number = 1
+    while True:
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        spent = time.perf_counter() - t
+        if spent >= 0.02:
+            break
+        number *= 2
+    best = spent
+    for _ in range(repeat - 1):
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - t)
+    return best / number
+
+
+def measure(m: 'object', p: 'dict', repeat: 'int') -> 'dict[str, float]':
+    # Missing features are skipped, so older revisions can be measured too.
+    w, d, a, c = p['width'], p['depth'], p['args'], p['choices']
+    root = tree(m, w, d, a, c)
+    good = argv(d, a, c)
+    bad = path(d) + ['--unknown']
+    apps = [root]
+    for _ in range(d):
+        apps.append(apps[-1].apps[0])
+    result = {}
+
+    def stale(app: 'object') -> 'None':
+        # Any setter invalidates the memoized text of its object.
+        app.helper.help = app.helper.help
+        for x in app.args:
+            x.help = x.help
+        for x in app.apps:
+            stale(x)
+
+    def parser(**kwds) -> 'object':
+        return m.Parser(
+            'root',
+            apps=[root],
+            allow_abbrev=False,
+            add_help=False,
+            **kwds,
+        )
+
+    def error(x: 'object') -> 'None':
+        try:
+            x.parse(bad)
+        except m.CallError:
+            return
+        raise RuntimeError('The error path is not taken.')
+
+    def help() -> 'None':
+        stale(apps[-1])
+        apps[-1].helper.text_help(apps, '')
+
+    def tree_help() -> 'None':
+        stale(root)
+        ''.join(root.helper.iter_tree([root], ''))
+
+    full = parser()
+    result['construct'] = timed(lambda: parser(), repeat)
+    if lazy(m):
+        result['construct lazy'] = timed(lambda: parser(lazy=True), repeat)
+    result['parse'] = timed(lambda: full.parse(good), repeat)
+    result['error'] = timed(lambda: error(full), repeat)
+    if hasattr(m, 'Engine'):
+        engine = m.Engine(root)
+        result['construct native'] = timed(lambda: m.Engine(root), repeat)
+        result['parse native'] = timed(lambda: engine.parse(good), repeat)
+        result['error native'] = timed(lambda: error(engine), repeat)
+    if hasattr(m, 'Runner'):
+        runner = m.Runner(root)
+        result['run'] = timed(lambda: runner.run(good), repeat)
+        runner = m.Runner(root, native=True)
+        result['run native'] = timed(lambda: runner.run(good), repeat)
+    result['help'] = timed(help, repeat)
+    result['help memo'] = timed(
+        lambda: apps[-1].helper.text_help(apps, ''), repeat)
+    if hasattr(m.AppHelper, 'iter_tree'):
+        result['help tree'] = timed(tree_help, repeat)
+    if hasattr(m, 'completion'):
+        result['completion script'] = timed(lambda: m.completion(root), repeat)
+    return result
+
+
+def measure_cold(p: 'dict', repeat: 'int', runs: 'int') -> 'dict[str, float]':
+    result = {'import': import_time.measure(runs, p['path']) / 1000}
+    env = dict(os.environ, _ARGCOMPLETE='1')
+    out = subprocess.run(
+        [sys.executable, '-c', CODE, os.path.dirname(__file__), p['path']] +
+        [str(p[x]) for x in ['width', 'depth', 'args', 'choices']] +
+        [str(repeat)],
+        env=env,
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout
+    if not math.isnan(float(out)):
+        result['completion'] = float(out)
+    return result
+
+
+def scale(m: 'object', p: 'dict', spec: 'str', repeat: 'int') -> 'None':
+    # The order is estimated from the first and the last point. For width and
+    # depth, the size is the number of commands.
+    name, values = spec.split('=')
+    values = [int(x) for x in values.split(',')]
+    rows = []
+    for v in values:
+        q = dict(p, **{name: v})
+        size = v
+        if name in ['width', 'depth']:
+            size = sum(q['width'] ** i for i in range(q['depth'] + 1))
+        rows.append((v, size, measure(m, q, repeat)))
+        print(f'{name}={v} done', file=sys.stderr)
+    names = list(rows[0][2])
+    print(f'{name:>8} ' + ' '.join(f'{x:>18}' for x in names))
+    for v, _, r in rows:
+        print(f'{v:>8} ' + ' '.join(f'{text(r[x]):>18}' for x in names))
+    if len(rows) > 1 and rows[0][1] != rows[-1][1]:
+        n = math.log(rows[-1][1] / rows[0][1])
+        k = [math.log(rows[-1][2][x] / rows[0][2][x]) / n for x in names]
+        print(f'{"order":>8} ' + ' '.join(f'{f"~n^{x:.2f}":>18}' for x in k))
+
+
+def compare(result: 'dict[str, float]', path: 'str', tolerance: 'float') -> 'bool':
+    with open(path) as f:
+        base = json.load(f)
+    if base['params'] != result['params']:
+        print(f'Note: the baseline parameters differ: {base["params"]}.')
+    ok = True
+    for name, now in result['metrics'].items():
+        old = base['metrics'].get(name)
+        if old is None:
+            continue
+        ratio = now / old
+        mark = ''
+        if ratio > tolerance:
+            mark = ' SLOWER'
+            ok = False
+        print(f'{name:>18}: {text(now):>10} vs {text(old):>10} {ratio:6.2f}x{mark}')
+    return ok
+
+
+def text(v: 'float') -> 'str':
+    if v < 1e-3:
+        return f'{v * 1e6:.2f} us'
+    if v < 1:
+        return f'{v * 1e3:.2f} ms'
+    return f'{v:.2f} s'
+
+
+def main() -> 'None':
+    parser = argparse.ArgumentParser(description='argapp benchmarks.')
+    parser.add_argument('--path', default=ROOT,
+                        help='argapp to measure, a directory or a file.')
+    parser.add_argument('--width', type=int, default=4,
+                        help='Subcommands per command.')
+    parser.add_argument('--depth', type=int, default=2,
+                        help='Levels of subcommands.')
+    parser.add_argument('--args', type=int, default=20,
+                        help='Arguments per command.')
+    parser.add_argument('--choices', type=int, default=50,
+                        help='Values per choice argument.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Repeats per metric, the best one is taken.')
+    parser.add_argument('--runs', type=int, default=10,
+                        help='Fresh interpreters for the cold import.')
+    parser.add_argument('--scale', metavar='NAME=V1,V2,...',
+                        help='Report a scaling curve for one parameter.')
+    parser.add_argument('--save', metavar='FILE',
+                        help='Store the result as a baseline.')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='Compare the result with a baseline.')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='Allowed ratio to the baseline.')
+    ns = parser.parse_args()
+    p = {x: getattr(ns, x) for x in ['width', 'depth', 'args', 'choices']}
+    m = load(ns.path)
+    if ns.scale:
+        scale(m, p, ns.scale, ns.repeat)
+        return
+    metrics = measure_cold(dict(p, path=ns.path), ns.repeat, ns.runs)
+    metrics.update(measure(m, p, ns.repeat))
+    result = {'params': p, 'metrics': metrics}
+    print(', '.join(f'{k}={v}' for k, v in p.items()))
+    for name, v in metrics.items():
+        print(f'{name:>18}: {text(v):>10}')
+    if ns.save:
+        with open(ns.save, 'w') as f:
+            json.dump(result, f, indent=2)
+    if ns.baseline and not compare(result, ns.baseline, ns.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+import importlib.util
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The repository is the package, its directory name may differ.
+if 'argapp' not in sys.modules:
+    s = importlib.util.spec_from_file_location(
+        'argapp', os.path.join(ROOT, '__init__.py'), submodule_search_locations=[])
+    m = importlib.util.module_from_spec(s)
+    sys.modules['argapp'] = m
+    s.loader.exec_module(m)
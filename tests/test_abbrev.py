@@ -0,0 +1,85 @@
+'''
+The abbreviations of the long options and the subcommands.
+
+Parser overrides the private methods of argparse, whose results differ between
+the Python releases. The same command lines go through Engine as a reference.
+'''
+
+import pytest
+
+from argapp import App, Arg, Engine, Parser
+from test_native import run
+
+
+def tree() -> 'App':
+    root = App('root')
+    root.args.extend([
+        Arg(lopt='verbose', count=0),
+        Arg(lopt='version'),
+        Arg(lopt='name'),
+        Arg(lopt='ch', choices=['a', 'b']),
+    ])
+    for name in ['start', 'stop', 'list']:
+        sub = App(name)
+        sub.args.append(Arg(lopt='force', count=0))
+        root.apps.append(sub)
+    return root
+
+
+def parsed(native: 'bool', argv: 'list[str]') -> 'tuple':
+    root = tree()
+    if native:
+        parser = Engine(root, abbrev=True)
+    else:
+        parser = Parser('root', apps=[root], abbrev=True, allow_abbrev=False, add_help=False)
+    return run(parser, ['root'] + argv)
+
+
+def values(result: 'tuple') -> 'dict[str, str]':
+    assert result[0] == 'ok', result
+    return dict(result[1])
+
+
+@pytest.mark.parametrize('native', [False, True])
+@pytest.mark.parametrize('argv', [['--verb', 'list'], ['--verbose', 'li']])
+def test_flag(native: 'bool', argv: 'list[str]') -> 'None':
+    result = parsed(native, argv)
+    assert values(result)['VERBOSE'] == 'True'
+    assert result[2] == ['root', 'list']
+
+
+@pytest.mark.parametrize('native', [False, True])
+@pytest.mark.parametrize('argv', [['--na', 'x', 'list'], ['--na=x', 'list'], ['--nam=x', 'list']])
+def test_value(native: 'bool', argv: 'list[str]') -> 'None':
+    assert values(parsed(native, argv))['NAME'] == "'x'"
+
+
+@pytest.mark.parametrize('native', [False, True])
+def test_subcommand(native: 'bool') -> 'None':
+    result = parsed(native, ['sta', '--fo'])
+    assert values(result)['FORCE'] == 'True'
+    assert result[2] == ['root', 'start']
+
+
+@pytest.mark.parametrize('native', [False, True])
+@pytest.mark.parametrize('argv, text', [
+    (['--ver', 'list'], 'Ambiguous arguments: --ver.'),
+    (['st'], 'Ambiguous subcommand: st.'),
+    (['nope'], 'Invalid subcommand.'),
+    (['--ch=c', 'list'], 'Invalid value of argument --ch: c.'),
+    (['--xyz', 'list'], 'Unknown arguments: --xyz.'),
+])
+def test_error(native: 'bool', argv: 'list[str]', text: 'str') -> 'None':
+    result = parsed(native, argv)
+    assert result[0] == 'error'
+    assert text in result[1]
+
+
+@pytest.mark.parametrize('argv', [
+    ['--verb', '--na=x', 'sto', '--fo'],
+    ['--ver', 'list'],
+    ['st'],
+    ['--ch=c', 'list'],
+])
+def test_native_matches_argparse(argv: 'list[str]') -> 'None':
+    assert parsed(True, argv) == parsed(False, argv)
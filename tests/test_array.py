@@ -0,0 +1,31 @@
+'''
+The bulk numeric conversion of Arg.array.
+'''
+
+import pytest
+
+import argapp
+from argapp import Arg, CallError
+
+
+def test_array_values() -> 'None':
+    arg = Arg(lopt='x', type=int, count='*', array=True)
+    assert list(arg(['1', '-2', '3'])) == [1, -2, 3]
+    with pytest.raises(CallError) as e:
+        arg(['1', 'x'])
+    assert e.value.text == 'Invalid value of argument --x[1]: x. Must be: int.'
+
+
+def test_array_default() -> 'None':
+    arg = Arg(lopt='x', type=float, count='*', array=True, default=[1.5])
+    v = arg(None)
+    assert type(v) is type(arg(['2']))
+    assert list(v) == [1.5]
+    assert arg(None) is not v
+    arg = Arg(lopt='x', type=int, count='*', array=True, append=True, default=[1])
+    assert [list(x) for x in arg([None, ['2']])] == [[1], [2]]
+
+
+def test_numpy_looked_up_once() -> 'None':
+    Arg(lopt='x', type=int, count='+', array=True)(['1'])
+    assert argapp.NUMPY is not None
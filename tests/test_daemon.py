@@ -0,0 +1,18 @@
+'''
+The completion daemon socket, shared by the generated scripts and main().
+'''
+
+import sys
+
+import argapp
+from argapp import App
+
+
+def test_socket_per_program(monkeypatch: 'object') -> 'None':
+    app = App('tool')
+    monkeypatch.setattr(sys, 'argv', ['/opt/a/tool'])
+    sock = argapp.Daemon(app, ['/opt/a/tool'], 1).path.rsplit('/', 1)[1]
+    assert f'/argapp-$UID/{sock} ' in argapp.completion(app, 'bash')
+    assert argapp.Daemon(app, ['/opt/b/tool'], 1).path.rsplit('/', 1)[1] != sock
+    monkeypatch.setattr(sys, 'executable', '/opt/other/python')
+    assert argapp.Daemon(app, ['/opt/a/tool'], 1).path.rsplit('/', 1)[1] != sock
@@ -0,0 +1,53 @@
+'''
+The help text and its overrides.
+'''
+
+import contextlib
+import io
+
+import pytest
+
+from argapp import App, AppHelper, Arg, Engine, Parser
+
+
+class Helper(AppHelper):
+    def text_help(self, apps: 'list[App]', name: 'str') -> 'str':
+        return f'custom {apps[-1].name}'
+
+
+def app(helper: 'AppHelper') -> 'App':
+    root = App('root', helper=helper)
+    root.args.append(Arg(lopt='flag', count=0, help='A flag.'))
+    return root
+
+
+def printed(parser: 'Parser | Engine', argv: 'list[str]') -> 'str':
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out), pytest.raises(SystemExit):
+        parser.parse(argv)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize('native', [False, True])
+def test_text_help_override(native: 'bool') -> 'None':
+    root = app(Helper())
+    parser = Engine(root) if native else Parser('root', apps=[root], add_help=False)
+    assert printed(parser, ['root', '--help']) == 'custom root\n'
+
+
+@pytest.mark.parametrize('native', [False, True])
+def test_help_streamed(native: 'bool') -> 'None':
+    root = app(AppHelper())
+    parser = Engine(root) if native else Parser('root', apps=[root], add_help=False)
+    assert printed(parser, ['root', '-h']) == f'{root.helper.text_help([root], "")}\n'
+
+
+class Sections(AppHelper):
+    def section_args(self, title: 'str', args: 'list[Arg]') -> 'str':
+        return f'{title}: {len(args)}'
+
+
+def test_section_args_override() -> 'None':
+    root = app(Sections(tree='help-all'))
+    text = root.helper.text_help([root], '')
+    assert 'Optional arguments: 3' in text
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench'))
+
+import import_time
+
+
+def test_import_time_within_budget() -> 'None':
+    budget = import_time.budget()
+    if budget is None:
+        pytest.skip('ARGAPP_IMPORT_BUDGET=off')
+    base, own, argcomplete = import_time.measure(5)
+    assert not argcomplete
+    assert own <= base * budget, f'import argapp: {own:.2f} ms, standard modules: {base:.2f} ms'
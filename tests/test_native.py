@@ -0,0 +1,69 @@
+'''
+The native parsing against argparse on random trees and command lines.
+'''
+
+import contextlib
+import io
+import random
+
+import pytest
+
+from argapp import App, Arg, CallError, Engine, Parser
+
+
+COUNTS = [1, 2, '?', '*', '+', '~']
+TOKENS = [
+    '-v', '-vv', '-vn', '--verbose', '--verbose=1', '-n', '-nX', '--name', '--name=x',
+    '--opt', '--opt=', '--many', '-m', '--two', '--req', '-r', '--ch', '--num', '-k5',
+    '-x', '--y', '--y=1', '--', 'a', 'b', 'c', 'x', '5', '-5', '-1.5', '-', 's1', 's2',
+    '--unknown', '-q', '-h',
+]
+
+
+def tree(rng: 'random.Random') -> 'App':
+    root = App('root')
+    root.args.extend([
+        Arg(lopt='verbose', sopt='v', count=0),
+        Arg(lopt='name', sopt='n'),
+        Arg(lopt='opt', count='?'),
+        Arg(lopt='many', sopt='m', count='*'),
+        Arg(lopt='two', count=2),
+        Arg(lopt='req', sopt='r', required=rng.random() < 0.3),
+        Arg(lopt='ch', choices=['a', 'b']),
+        Arg(lopt='num', sopt='k', type=int),
+    ])
+    root.args.extend(
+        Arg(name=f'P{i}', count=rng.choice(COUNTS)) for i in range(rng.randrange(4)))
+    if rng.random() < 0.5:
+        for name in ['s1', 's2']:
+            sub = App(name)
+            sub.args.extend([Arg(lopt='x', sopt='x', count=0), Arg(lopt='y')])
+            sub.args.extend(
+                Arg(name=f'Q{i}', count=rng.choice(COUNTS)) for i in range(rng.randrange(3)))
+            root.apps.append(sub)
+    return root
+
+
+def run(parser: 'Parser | Engine', argv: 'list[str]') -> 'tuple':
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            args, apps = parser.parse(argv)
+        return ('ok', sorted((k.name, repr(v)) for k, v in args.items()), [x.name for x in apps])
+    except CallError as e:
+        return ('error', e.text, e.code)
+    except SystemExit as e:
+        return ('exit', e.code, out.getvalue())
+    # Arg.type errors are not wrapped, the same on both sides.
+    except ValueError as e:
+        return ('type', str(e))
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_native_matches_argparse(seed: 'int') -> 'None':
+    rng = random.Random(seed)
+    for _ in range(250):
+        root = tree(rng)
+        argv = ['root'] + [rng.choice(TOKENS) for _ in range(rng.randrange(8))]
+        parser = Parser('root', apps=[root], allow_abbrev=False, add_help=False)
+        assert run(Engine(root), argv) == run(parser, argv), argv
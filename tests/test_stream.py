@@ -0,0 +1,27 @@
+'''
+The argument files and stdin value lists of Arg.stream.
+'''
+
+import pytest
+
+from argapp import Arg, CallError
+
+
+def test_append_stream_choices(tmp_path: 'object') -> 'None':
+    path = tmp_path / 'values'
+    path.write_text('a\nb\n\na\n')
+    arg = Arg(lopt='x', count='*', append=True, stream=True, choices=['a', 'b'])
+    v = arg([[f'@{path}'], ['b', f'@{path}'], None])
+    assert [list(x) for x in v] == [['a', 'b', 'a'], ['b', 'a', 'b', 'a'], []]
+    path.write_text('a\nc\n')
+    v = arg([['a'], [f'@{path}']])
+    assert list(v[0]) == ['a']
+    with pytest.raises(CallError) as e:
+        list(v[1])
+    assert e.value.text.startswith('Invalid value of argument --x[1][1]: c.')
+
+
+def test_stream_default() -> 'None':
+    arg = Arg(lopt='x', count='*', stream=True, default=['a'])
+    assert list(arg(None)) == ['a']
+    assert list(arg(None)) == ['a']
@@ -0,0 +1,42 @@
+'''
+The suggestions for typos and the listing of the names without them.
+'''
+
+import pickle
+
+import argapp
+from argapp import Arg, CallError
+
+
+def error(arg: 'Arg', v: 'str') -> 'str':
+    try:
+        arg(v)
+    except CallError as e:
+        return e.text
+    raise AssertionError(v)
+
+
+def test_suggest_many_choices() -> 'None':
+    arg = Arg(lopt='c', choices=[f'choice-{i}' for i in range(50000)])
+    text = error(arg, 'choice-1234x')
+    assert 'Did you mean:' in text
+    assert '\n * choice-1234\n' in f'{text}\n'
+
+
+def test_list_cut() -> 'None':
+    arg = Arg(lopt='c', choices=[f'choice-{i}' for i in range(1000)])
+    text = error(arg, 'xyz')
+    assert text.count('\n * ') == argapp.LISTED + 1
+    assert text.endswith(f'\n * ... and {1000 - argapp.LISTED} more')
+
+
+def test_index_stored(tmp_path: 'object', monkeypatch: 'object') -> 'None':
+    names = [f'name-{i}' for i in range(2000)]
+    monkeypatch.setattr(argapp, 'INDEXES', str(tmp_path))
+    built = argapp.index(names)
+    assert len(list(tmp_path.iterdir())) == 1
+    loaded = argapp.index(names)
+    assert loaded.names == built.names
+    for v in ['name-12x', 'nme-1999', 'name-']:
+        assert loaded.rank(v) == built.rank(v)
+    assert pickle.loads(pickle.dumps(built.dump())) == loaded.dump()
@@ -0,0 +1,40 @@
+'''
+The conversion of Arg.workers on a thread pool.
+'''
+
+import pytest
+
+from argapp import Arg, CallError
+
+
+@pytest.mark.parametrize('n', [1, 2, 50])
+def test_workers_values(n: 'int') -> 'None':
+    arg = Arg(lopt='x', type=int, count='*', workers=4)
+    assert arg([str(i) for i in range(n)]) == list(range(n))
+
+
+@pytest.mark.parametrize('i', [0, 1, 37, 49])
+def test_workers_error_index(i: 'int') -> 'None':
+    v = [str(x) for x in range(50)]
+    v[i] = 'x'
+    with pytest.raises(CallError) as e:
+        Arg(lopt='x', type=int, count='*', workers=4)(v)
+    assert e.value.text == f'Invalid value of argument --x[{i}]: x. Must be: int.'
+
+
+def test_workers_append() -> 'None':
+    arg = Arg(lopt='x', type=int, count='+', append=True, workers=2)
+    assert arg([['1', '2'], None]) == [[1, 2], None]
+    with pytest.raises(CallError) as e:
+        arg([['1'], ['2', 'y', 'z']])
+    assert e.value.text == 'Invalid value of argument --x[1][1]: y. Must be: int.'
+    arg = Arg(lopt='x', type=int, append=True, default=5, workers=2)
+    assert arg([None, '2']) == [5, 2]
+    with pytest.raises(CallError) as e:
+        arg(['1', None, 'y'])
+    assert e.value.text == 'Invalid value of argument --x[2]: y. Must be: int.'
+
+
+def test_no_workers_raise_as_is() -> 'None':
+    with pytest.raises(ValueError):
+        Arg(lopt='x', type=int, count='*')(['1', 'x'])